@@ -1,11 +1,14 @@
 import streamlit as st
-import os
+import shutil
 import tempfile
-from datetime import datetime
-from src.components.data_processor import DataProcessor
-from src.components.vector_store import VectorStore
-from src.core.rag_pipeline import RAGPipeline
-from src.utils.logger import logger
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import get_settings
+from src.utils.logger import is_enabled, logger
+from src.utils.sources import to_source_refs
+
+# Keep the last 20 question/answer turns in session state
+MAX_CHAT_HISTORY = 40
 
 # Page configuration
 st.set_page_config(
@@ -41,13 +44,44 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_doc_processor():
+    """DataProcessor only holds chunking config, so one instance serves every session"""
+    # Heavy imports (LangChain, Cohere, FAISS, pypdf) are deferred until first use
+    from src.components.data_processor import DataProcessor
+
+    settings = get_settings()
+    return DataProcessor(
+        chunk_size=settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap,
+        cache_dir=settings.chunk_cache_dir
+    )
+
+@st.cache_resource
+def get_rag_pipeline(cohere_api_key):
+    """Share the pipeline (and its Cohere client) between sessions using the same API key.
+
+    Per-session settings (k, temperature, rerank) are passed on each call, never stored on it.
+    """
+    from src.core.rag_pipeline import RAGPipeline
+
+    return RAGPipeline()
+
+@st.cache_resource
+def get_llm_semaphore():
+    """Process-wide cap on concurrent LLM calls; each Streamlit session runs in its own thread"""
+    return threading.BoundedSemaphore(get_settings().max_concurrent_llm)
+
 def initialize_session_state():
     if 'doc_processor' not in st.session_state:
-        st.session_state.doc_processor = DataProcessor()
+        st.session_state.doc_processor = get_doc_processor()
     if 'vector_store' not in st.session_state:
+        from src.components.vector_store import VectorStore
+
+        # Holds the user's own uploads, so it stays per-session
         st.session_state.vector_store = VectorStore()
     if 'rag_pipeline' not in st.session_state:
-        st.session_state.rag_pipeline = RAGPipeline()
+        st.session_state.rag_pipeline = get_rag_pipeline(st.session_state.cohere_api_key)
     if 'documents_processed' not in st.session_state:
         st.session_state.documents_processed = False
     if 'chat_history' not in st.session_state:
@@ -87,27 +121,37 @@ def api_key_form():
 
 
 
+def process_uploaded_file(uploaded_file, doc_processor):
+    """Chunk a single uploaded file; DataProcessor's chunk cache skips files it has seen before"""
+    # The temp file is removed when the block exits, even if processing raises
+    with tempfile.NamedTemporaryFile(suffix=f".{uploaded_file.name.split('.')[-1]}", dir=tempfile.gettempdir()) as tmp_file:
+        # Copy in 1 MiB blocks rather than materialising the whole upload at once
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+        tmp_file.flush()
+        return doc_processor.process_document(tmp_file.name, uploaded_file.name)
+
 def process_uploaded_files(uploaded_files):
     """Process uploaded files and create vector store"""
     try:
         all_chunks = []
         
         with st.spinner("Processing uploaded documents..."):
-            for uploaded_file in uploaded_files:
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                    tmp_file.write(uploaded_file.getbuffer())
-                    tmp_path = tmp_file.name
-                
-                # Process document
-                chunks = st.session_state.doc_processor.process_document(tmp_path, uploaded_file.name)
-                all_chunks.extend(chunks)
-                
-                # Clean up temp file
-                os.unlink(tmp_path)
-                
-                st.success(f"✅ Processed {uploaded_file.name}: {len(chunks)} chunks")
+            doc_processor = st.session_state.doc_processor
+
+            def _process_one(uploaded_file):
+                return uploaded_file.name, process_uploaded_file(uploaded_file, doc_processor)
+
+            # Parse files concurrently; Streamlit UI calls stay on the script thread. Results come
+            # back in upload order, so chunk order and deduplication's primary source are stable
+            with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as executor:
+                for file_name, chunks in executor.map(_process_one, uploaded_files):
+                    all_chunks.extend(chunks)
+                    st.success(f"✅ Processed {file_name}: {len(chunks)} chunks")
         
+        # Boilerplate pages shared between uploads only need embedding once
+        all_chunks = st.session_state.doc_processor.deduplicate_chunks(all_chunks)
+
         # Create vector store
         if all_chunks:
             with st.spinner("Creating vector embeddings..."):
@@ -121,24 +165,42 @@ def process_uploaded_files(uploaded_files):
         st.error(f"Error processing documents: {str(e)}")
         logger.error(f"Document processing error: {str(e)}")
 
+def append_chat_message(message):
+    """Append to chat history, dropping the oldest messages beyond MAX_CHAT_HISTORY"""
+    st.session_state.chat_history.append(message)
+    st.session_state.chat_history = st.session_state.chat_history[-MAX_CHAT_HISTORY:]
+
+_SOURCE_TEMPLATE = """
+<div class="source-box">
+    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
+        <strong>Source {index}</strong>
+        <span class="confidence-score">Relevance: {score:.3f}</span>
+    </div>
+    <p><strong>File:</strong> {source}</p>
+    <p><strong>Content:</strong> {preview}...</p>
+</div>"""
+
+def render_sources(source_refs):
+    """Render SourceRef entries inside a collapsed expander with a single markdown call"""
+    html = "\n".join(
+        _SOURCE_TEMPLATE.format_map({
+            "index": i,
+            "score": ref.score,
+            "source": ref.source,
+            "preview": ref.preview
+        })
+        for i, ref in enumerate(source_refs, 1)
+    )
+    with st.expander("📚 View Sources", expanded=False):
+        st.markdown(html, unsafe_allow_html=True)
+
 def display_chat_message(role, content, sources=None):
     """Display a chat message with optional sources"""
     with st.chat_message(role):
         st.write(content)
         
         if sources and role == "assistant":
-            with st.expander("📚 View Sources", expanded=False):
-                for i, (chunk, score) in enumerate(sources, 1):
-                    st.markdown(f"""
-                    <div class="source-box">
-                        <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 0.5rem;">
-                            <strong>Source {i}</strong>
-                            <span class="confidence-score">Relevance: {score:.3f}</span>
-                        </div>
-                        <p><strong>File:</strong> {chunk.metadata.get('source', 'Unknown')}</p>
-                        <p><strong>Content:</strong> {chunk.page_content[:300]}...</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            render_sources(sources)
 
 def main():
     if 'cohere_api_key' not in st.session_state:
@@ -173,9 +235,7 @@ def main():
         st.header("⚙️ RAG Settings")
         k_value = st.slider("Number of retrieved chunks", 1, 10, 3)
         temperature = st.slider("Response creativity", 0.0, 1.0, 0.1, 0.1)
-
-        if hasattr(st.session_state.rag_pipeline, 'update_settings'):
-            st.session_state.rag_pipeline.update_settings(k=k_value, temperature=temperature)
+        use_rerank = st.checkbox("Enable rerank", value=False, help="Retrieve a wider candidate set and rerank it with Cohere Rerank")
 
     # Main chat interface
     st.header("💬 Ask Your Medical Question")
@@ -188,44 +248,48 @@ def main():
             return
 
         display_chat_message("user", prompt)
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
+        append_chat_message({"role": "user", "content": prompt})
 
         with st.chat_message("assistant"):
             with st.spinner("Searching documents and generating response..."):
                 try:
-                    response_data = st.session_state.rag_pipeline.generate_response(
-                        query=prompt,
-                        vectorstore=st.session_state.vector_store,
-                        temperature=temperature
-                    )
+                    with get_llm_semaphore():
+                        response_data = st.session_state.rag_pipeline.generate_response(
+                            query=prompt,
+                            vectorstore=st.session_state.vector_store,
+                            temperature=temperature,
+                            k=k_value,
+                            rerank=use_rerank,
+                            k_candidates=get_settings().rerank_candidates
+                        )
                     st.write(response_data['answer'])
-                    if response_data['sources']:
-                        with st.expander("📚 View Sources", expanded=False):
-                            for i, (chunk, score) in enumerate(response_data['sources'], 1):
-                                st.markdown(f"""<div class="source-box">
-                                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
-                                        <strong>Source {i}</strong>
-                                        <span class="confidence-score">Relevance: {score:.3f}</span>
-                                    </div>
-                                    <p><strong>File:</strong> {chunk.metadata.get('source', 'Unknown')}</p>
-                                    <p><strong>Content:</strong> {chunk.page_content[:300]}...</p>
-                                </div>""", unsafe_allow_html=True)
-                    st.session_state.chat_history.append({
+                    # Session state keeps only source name, chunk id, score and the shown preview
+                    # FAISS returns cosine similarities (L2 distances for legacy stores); rerank scores are relevances
+                    source_refs = to_source_refs(
+                        response_data['sources'],
+                        higher_is_better=(response_data['metadata'].get('reranked', False)
+                                          or st.session_state.vector_store.scores_are_similarities)
+                    )
+                    if source_refs:
+                        render_sources(source_refs)
+                    append_chat_message({
                         "role": "assistant",
                         "content": response_data['answer'],
-                        "sources": response_data['sources']
+                        "sources": source_refs
                     })
 
-                    logger.info(f"Query: {prompt}")
-                    logger.info(f"Retrieved {len(response_data['sources'])} sources")
-                    logger.info(f"retrieved documents, {response_data['sources']}")
-                    logger.info(f"Response: {response_data['answer'][:100]}...")  
-                    logger.info(f"Response generated successfully")
+                    # One record per answered query; the document repr is only built when INFO is enabled
+                    if is_enabled("INFO"):
+                        logger.info(
+                            f"Query: {prompt}\nRetrieved {len(response_data['sources'])} sources\n"
+                            f"retrieved documents, {response_data['sources']}\n"
+                            f"Response: {response_data['answer']:.100}...\nResponse generated successfully"
+                        )
                 except Exception as e:
                     error_message = f"Sorry, I encountered an error: {str(e)}"
                     st.error(error_message)
                     logger.error(f"Error generating response: {str(e)}")
-                    st.session_state.chat_history.append({
+                    append_chat_message({
                         "role": "assistant",
                         "content": error_message
                     })
@@ -12,7 +12,17 @@ class Settings(BaseSettings):
     temperature: float = 0.1
     llm: str = "command-r-plus"
     embedding_model_name: str = "embed-english-v3.0"
+    embedding_type: str = "float"
     enable_file_logging: bool = True
+    chunk_cache_dir: str = ".cache/chunks"
+    max_concurrent_llm: int = 4
+    rerank_model: str = "rerank-english-v3.0"
+    rerank_candidates: int = 30
+    rerank_cache_ttl: int = 900
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_ttl: int = 3600
+    faiss_quantization: str = "fp16"
     
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,92 +1,268 @@
 from typing import List, Optional
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
 from langchain_core.documents import Document
 from src.utils.logger import logger
 from src.components.data_loader import DataLoader
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pickle
+
+_NEWLINE = ord('\n')
+_SPACE = ord(' ')
+_TRASH_TBL = str.maketrans('', '', '\x00\ufeff')
+# Below this many files, worker process startup costs more than parallel parsing saves
+PARALLEL_MIN_FILES = 4
+
+def _separator_ends(text: str) -> np.ndarray:
+    """Offsets just past each separator match of the regex \\n\\n|\\n| (paragraph, line, word).
+
+    Equivalent to collecting m.end() over re.finditer, but computed with array ops on
+    the text's code points instead of one Python match object per separator.
+    """
+    codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    is_nl = codes == _NEWLINE
+    prev_nl = np.zeros_like(is_nl)
+    prev_nl[1:] = is_nl[:-1]
+    next_nl = np.zeros_like(is_nl)
+    next_nl[:-1] = is_nl[1:]
+
+    nl_pos = np.flatnonzero(is_nl)
+    run_starts = np.flatnonzero(is_nl & ~prev_nl)
+    run_start_of = run_starts[np.searchsorted(run_starts, nl_pos, side='right') - 1]
+    # The regex pairs newlines left to right within a run; an odd leftover matches alone
+    keep_nl = nl_pos[((nl_pos - run_start_of) % 2 == 1) | ~next_nl[nl_pos]]
+
+    ends = np.concatenate((keep_nl, np.flatnonzero(codes == _SPACE)))
+    ends.sort()
+    return ends + 1
+
+def _stripped_len(text: str) -> int:
+    """len(text.strip()) without allocating a copy when the text has no edge whitespace"""
+    if text and not text[0].isspace() and not text[-1].isspace():
+        return len(text)
+    return len(text.strip())
+
+def _content_length(chunk: Document, min_length: int) -> int:
+    """Stripped content length; split chunks are already stripped, so a matching chunk_size is exact"""
+    # A stamp that no longer matches the content (edited or hand-built chunk) is ignored
+    if chunk.metadata.get('chunk_size') == len(chunk.page_content):
+        return len(chunk.page_content)
+    # Stripping never lengthens text, so short chunks are rejected before measuring
+    if len(chunk.page_content) < min_length:
+        return len(chunk.page_content)
+    return _stripped_len(chunk.page_content)
 
 class DataProcessor:
     """Handles text preprocessing, chunking, and metadata tagging."""
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, cache_dir: Optional[str] = None):
+        # _fast_split steps back by the overlap, so it must leave each window room to advance
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be non-negative and smaller than chunk_size ({chunk_size})")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=["\n\n", "\n", " ", ""],
-            length_function=len,
-        )
+        self.cache_dir = cache_dir
+        self.loader = DataLoader()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
         logger.info(f"DataProcessor initialized - chunk_size: {chunk_size}, overlap: {chunk_overlap}")
 
-    def chunk_documents(self, documents: List[Document]) -> List[Document]:
+    def _fast_split(self, text: str) -> List[str]:
+        """Split text into windows of at most chunk_size characters, breaking on separators.
+
+        Separator offsets are located with vectorized array ops; window ends are then
+        picked with a binary search over the offset array. Falls back to a hard cut
+        when no separator lies inside the window.
+        """
+        n = len(text)
+        offsets = _separator_ends(text)
+        pieces = []
+        start = 0
+        while start < n:
+            boundary = start + self.chunk_size
+            if boundary >= n:
+                end = n
+            else:
+                idx = int(np.searchsorted(offsets, boundary, side='right')) - 1
+                end = int(offsets[idx]) if idx >= 0 and offsets[idx] > start else boundary
+
+            piece = text[start:end].strip()
+            if piece:
+                pieces.append(piece)
+            if end >= n:
+                break
+
+            # Step back by up to chunk_overlap characters, restarting on a separator
+            idx = int(np.searchsorted(offsets, end - self.chunk_overlap, side='left'))
+            next_start = int(offsets[idx]) if idx < len(offsets) else end
+            start = next_start if start < next_start < end else end
+        return pieces
+
+    def chunk_documents(self, documents: List[Document], metadata: Optional[dict] = None) -> List[Document]:
+        """Split documents into chunks; `metadata` is merged into every chunk's copy of its document's"""
+        extra = metadata or {}
         try:
-            chunks = self.text_splitter.split_documents(documents)
+            chunks = [
+                Document(page_content=piece, metadata={**doc.metadata, **extra})
+                for doc in documents
+                for piece in self._fast_split(doc.page_content)
+            ]
             logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
             return chunks
         except Exception as e:
             logger.error(f"Error chunking documents: {str(e)}")
             raise
 
-    def process_document(self, file_path: str, source_name: Optional[str] = None) -> List[Document]:
-        loader = DataLoader()
-        documents = loader.load(file_path)
+    def _cache_path(self, file_path: str) -> Optional[str]:
+        """Cache file for the chunks of `file_path`, keyed by content hash and chunk settings"""
+        if not self.cache_dir:
+            return None
+        try:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        except OSError:
+            return None
+        key = f"{digest.hexdigest()}_{self.chunk_size}_{self.chunk_overlap}.pkl"
+        return os.path.join(self.cache_dir, key)
+
+    def _load_cached_chunks(self, cache_path: Optional[str]) -> Optional[List[Document]]:
+        if not cache_path or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable chunk cache {cache_path}: {str(e)}")
+            return None
 
+    def _save_cached_chunks(self, cache_path: Optional[str], chunks: List[Document]) -> None:
+        if not cache_path:
+            return
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Could not write chunk cache {cache_path}: {str(e)}")
+
+    def process_document(self, file_path: str, source_name: Optional[str] = None) -> List[Document]:
         source = source_name or os.path.basename(file_path)
-        for doc in documents:
-            doc.metadata['source'] = source
-            doc.metadata['file_path'] = file_path
+        cache_path = self._cache_path(file_path)
+        chunks = self._load_cached_chunks(cache_path)
+        if chunks is not None:
+            # Uploads land on a fresh temp path each time, so re-tag the cached chunks
+            for chunk in chunks:
+                chunk.metadata['source'] = source
+                chunk.metadata['file_path'] = file_path
+            logger.info(f"Loaded {source} from chunk cache: {len(chunks)} chunks")
+            return chunks
 
-        chunks = self.chunk_documents(documents)
+        documents = self.loader.load(file_path)
+        chunks = self.chunk_documents(documents, {'source': source, 'file_path': file_path})
         for i, chunk in enumerate(chunks):
             chunk.metadata['chunk_id'] = i
             chunk.metadata['chunk_size'] = len(chunk.page_content)
 
+        self._save_cached_chunks(cache_path, chunks)
         logger.info(f"Processed {source}: {len(chunks)} chunks")
         return chunks
 
+    def _safe_process_document(self, file_path: str) -> Optional[List[Document]]:
+        try:
+            return self.process_document(file_path)
+        except Exception as e:
+            logger.error(f"Failed to process {file_path}: {str(e)}")
+            return None
+
     def process_multiple_documents(self, file_paths: List[str]) -> List[Document]:
+        if len(file_paths) >= PARALLEL_MIN_FILES:
+            # PDF parsing is CPU-bound, so fan out across processes rather than threads
+            workers = min(os.cpu_count() or 1, len(file_paths))
+            results = [None] * len(file_paths)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self.process_document, path): i for i, path in enumerate(file_paths)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        # Slotted by input position so chunk order does not depend on finish order
+                        results[i] = future.result()
+                    except Exception as e:
+                        # Also covers a crashed worker, which map() would raise for the whole batch
+                        logger.error(f"Failed to process {file_paths[i]}: {str(e)}")
+        else:
+            results = [self._safe_process_document(path) for path in file_paths]
+
         all_chunks = []
         success = 0
-
-        for path in file_paths:
-            try:
-                chunks = self.process_document(path)
+        for chunks in results:
+            if chunks is not None:
                 all_chunks.extend(chunks)
                 success += 1
-            except Exception as e:
-                logger.error(f"Failed to process {path}: {str(e)}")
 
-        logger.info(f"Processed {success}/{len(file_paths)} files")
-        logger.info(f"Total chunks: {len(all_chunks)}")
+        logger.info(f"Processed {success}/{len(file_paths)} files\nTotal chunks: {len(all_chunks)}")
         return all_chunks
 
+    def deduplicate_chunks(self, chunks: List[Document]) -> List[Document]:
+        """Drop chunks whose content was already seen, keeping the first copy.
+
+        The surviving chunk lists every file it appeared in under metadata['sources'].
+        """
+        first_seen = {}
+        unique = []
+        for chunk in chunks:
+            key = hashlib.blake2b(chunk.page_content.encode('utf-8'), digest_size=16).digest()
+            source = chunk.metadata.get('source', 'Unknown')
+            kept = first_seen.get(key)
+            if kept is None:
+                chunk.metadata['sources'] = [source]
+                first_seen[key] = chunk
+                unique.append(chunk)
+            elif source not in kept.metadata['sources']:
+                kept.metadata['sources'].append(source)
+
+        logger.info(f"Deduplicated: {len(chunks)} -> {len(unique)} chunks (removed {len(chunks) - len(unique)})")
+        return unique
+
     def preprocess_text(self, text: str) -> str:
-        text = ' '.join(text.split())
-        text = text.replace('\x00', '').replace('\ufeff', '')
-        return text.strip()
+        # str.split() breaks on exactly the characters \s matches, and drops edge whitespace
+        return ' '.join(text.translate(_TRASH_TBL).split())
 
     def get_document_stats(self, chunks: List[Document]) -> dict:
         if not chunks:
             return {"total_chunks": 0, "total_characters": 0, "sources": []}
 
-        lengths = [len(chunk.page_content) for chunk in chunks]
+        sources = set()
+
+        def _sizes():
+            # Sources are gathered during the same walk that collects the lengths
+            for chunk in chunks:
+                sources.add(chunk.metadata.get('source', 'Unknown'))
+                yield len(chunk.page_content)
+
+        lengths = np.fromiter(_sizes(), dtype=np.int64, count=len(chunks))
+        total = int(lengths.sum())
+        mid = len(lengths) // 2
         stats = {
             "total_chunks": len(chunks),
-            "total_characters": sum(lengths),
-            "average_chunk_size": sum(lengths) / len(chunks),
-            "sources": list(set(chunk.metadata.get('source', 'Unknown') for chunk in chunks)),
+            "total_characters": total,
+            "average_chunk_size": total / len(chunks),
+            "sources": list(sources),
             "chunk_size_distribution": {
-                "min": min(lengths),
-                "max": max(lengths),
-                "median": sorted(lengths)[len(lengths) // 2],
+                "min": int(lengths.min()),
+                "max": int(lengths.max()),
+                # introselect instead of a full sort for a single order statistic
+                "median": int(np.partition(lengths, mid)[mid]),
             },
         }
         return stats
 
     def filter_chunks_by_length(self, chunks: List[Document], min_length: int = 50) -> List[Document]:
         original_count = len(chunks)
-        filtered = [chunk for chunk in chunks if len(chunk.page_content.strip()) >= min_length]
+        filtered = [chunk for chunk in chunks if _content_length(chunk, min_length) >= min_length]
         logger.info(f"Filtered: {original_count} -> {len(filtered)} chunks (removed {original_count - len(filtered)})")
         return filtered
 
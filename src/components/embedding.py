@@ -1,10 +1,22 @@
+import hashlib
+import threading
 import streamlit as st
+from collections import OrderedDict
+from typing import List, Optional
 from langchain_cohere import CohereEmbeddings
 from config.settings import get_settings
 from src.utils.logger import logger
 
+# Output sizes of the Cohere embedding models, so dim() needs no API call for them
+KNOWN_DIMS = {
+    "embed-english-v3.0": 1024,
+    "embed-multilingual-v3.0": 1024,
+    "embed-english-light-v3.0": 384,
+    "embed-multilingual-light-v3.0": 384,
+}
+
 class EmbeddingModel:
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
         self.settings = get_settings()
         self.model_name = self.settings.embedding_model_name
         self.cohere_api_key = None
@@ -13,15 +25,68 @@ class EmbeddingModel:
         else:
             self.cohere_api_key = self.settings.cohere_api_key
 
+        # "int8" has Cohere quantize server-side: ~3x smaller responses, and vectors whose direction
+        # (all the cosine index uses) stays close to the float ones
         self.embeddings = CohereEmbeddings(
             cohere_api_key=self.cohere_api_key,
-            model=self.model_name
+            model=self.model_name,
+            embedding_types=[self.settings.embedding_type]
         )
+        # LRU of query text digest -> vector, so repeated queries skip the API round-trip
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        # Guards the LRU; the pipeline holding this model is shared between session threads
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = KNOWN_DIMS.get(self.model_name)
         logger.info(f"Cohere embeddings initialized with model: {self.model_name}")
         
 
     def get(self):
         return self.embeddings
 
-    def embed_query(self, query: str):
-        return self.embeddings.embed_query(query)
+    def embed_query(self, query: str) -> List[float]:
+        key = hashlib.blake2b(query.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                return vector
+        # The API call runs outside the lock
+        vector = self.embeddings.embed_query(query)
+        self._dim = len(vector)
+        with self._lock:
+            self._cache[key] = vector
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries, sending every uncached one in a single request"""
+        keys = [hashlib.blake2b(q.encode('utf-8'), digest_size=16).digest() for q in queries]
+        with self._lock:
+            found = {key: self._cache[key] for key in keys if key in self._cache}
+        missing = list({key: q for key, q in zip(keys, queries) if key not in found}.items())
+        if missing:
+            vectors = self.embeddings.embed([q for _, q in missing], input_type="search_query")
+            found.update(zip((key for key, _ in missing), vectors))
+            self._dim = len(vectors[0])
+        with self._lock:
+            for key in keys:
+                self._cache[key] = found[key]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts in batched API calls"""
+        vectors = self.embeddings.embed_documents(texts)
+        if vectors:
+            self._dim = len(vectors[0])
+        return vectors
+
+    def dim(self) -> int:
+        """Embedding size, from the model table or the last embedding; probes the API only once"""
+        if self._dim is None:
+            self._dim = len(self.embed_query("x"))
+        return self._dim
@@ -1,12 +1,31 @@
+import threading
 import streamlit as st
-from typing import Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from langchain_cohere import ChatCohere
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 
 from config.settings import get_settings
-from src.utils.logger import logger
-    
+from src.utils.logger import is_enabled, logger
+
+_SYSTEM_PROMPT = """
+        You are a helpful medical assistant. Provide accurate, informative responses 
+        based on the given context. Always:
+
+        1. Base your answers on the provided context
+        2. Be clear and professional
+        3. Include disclaimers when appropriate
+        4. Suggest consulting healthcare professionals for serious concerns
+        5. Cite sources when possible
+        """
+_HUMAN_TEMPLATE = "Context: {context}\n\nQuestion: {question}\n\nAnswer:"
+# Immutable, so every request shares one instance instead of allocating its own
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_PROMPT)
+# Chat clients kept per (api key, model, temperature, max_tokens)
+_MAX_CACHED_CLIENTS = 8
+
 class Generator:
     """Handles language model and prompt template for generation without using LLMChain."""
 
@@ -16,6 +35,10 @@ class Generator:
         self.temperature = self.settings.temperature
         self.max_tokens = self.settings.max_tokens
         self.cohere_api_key = None
+        self._streaming_llm: Optional[BaseChatModel] = None
+        self._clients: "OrderedDict[Tuple, BaseChatModel]" = OrderedDict()
+        # The app shares one generator between session threads
+        self._clients_lock = threading.Lock()
         self.llm: BaseChatModel = self._load_llm()
         self.prompt = self._create_prompt_template()
         
@@ -25,41 +48,69 @@ class Generator:
             self.cohere_api_key = st.session_state["cohere_api_key"]
         else:
             self.cohere_api_key = self.settings.cohere_api_key
+        return self._get_client(self.temperature)
 
-        return ChatCohere(
-            cohere_api_key=self.cohere_api_key,
-            model=self.model_name,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-        )
+    def _get_client(self, temperature: float) -> BaseChatModel:
+        """Reuse a warm client per configuration instead of rebuilding one per temperature change"""
+        key = (self.cohere_api_key, self.model_name, temperature, self.max_tokens)
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = ChatCohere(
+                    cohere_api_key=self.cohere_api_key,
+                    model=self.model_name,
+                    temperature=temperature,
+                    max_tokens=self.max_tokens,
+                )
+                self._clients[key] = client
+                if len(self._clients) > _MAX_CACHED_CLIENTS:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(key)
+            return client
 
-    def _create_prompt_template(self) -> ChatPromptTemplate:
-        system_message = self._get_system_prompt()
-        human_message = """Context: {context}
+    def _llm_for(self, temperature: Optional[float]) -> BaseChatModel:
+        if temperature is None or temperature == self.temperature:
+            return self.llm
+        return self._get_client(temperature)
 
-        Question: {question}
+    @property
+    def streaming_llm(self) -> BaseChatModel:
+        # Built on first stream() and reused; update() drops it along with self.llm
+        if self._streaming_llm is None:
+            self._streaming_llm = ChatCohere(
+                cohere_api_key=self.cohere_api_key,
+                model=self.model_name,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                streaming=True
+            )
+        return self._streaming_llm
 
-        Answer:"""
+    def _create_prompt_template(self) -> ChatPromptTemplate:
         return ChatPromptTemplate.from_messages([
-            ("system", system_message),
-            ("human", human_message)
+            ("system", self._get_system_prompt()),
+            ("human", _HUMAN_TEMPLATE)
         ])
 
-    def generate(self, query: str, context: str) -> str:
-        formatted_prompt = self.prompt.format(context=context, question=query)
-        response = self.llm.invoke(formatted_prompt)
+    def _build_messages(self, query: str, context: str) -> List[BaseMessage]:
+        """Same messages self.prompt would produce, without the template/Runnable machinery"""
+        human = HumanMessage(content=_HUMAN_TEMPLATE.format(context=context, question=query))
+        # Prompt inspection without verbose chains: truncated, and only built when DEBUG is on
+        if is_enabled("DEBUG"):
+            logger.debug("prompt={:.500}", human.content)
+        return [_SYSTEM_MESSAGE, human]
+
+    def generate(self, query: str, context: str, temperature: Optional[float] = None) -> str:
+        response = self._llm_for(temperature).invoke(self._build_messages(query, context))
+        return response.content.strip()
+
+    async def agenerate(self, query: str, context: str, temperature: Optional[float] = None) -> str:
+        response = await self._llm_for(temperature).ainvoke(self._build_messages(query, context))
         return response.content.strip()
 
     def stream(self, query: str, context: str):
-        streaming_llm = ChatCohere(
-            cohere_api_key=self.settings.cohere_api_key,
-            model=self.model_name,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            streaming=True
-        )
-        formatted_prompt = self.prompt.format(context=context, question=query)
-        for chunk in streaming_llm.stream(formatted_prompt):
+        for chunk in self.streaming_llm.stream(self._build_messages(query, context)):
             if chunk.content:
                 yield chunk.content
 
@@ -73,6 +124,7 @@ class Generator:
         if max_tokens:
             self.max_tokens = max_tokens
         self.llm = self._load_llm()
+        self._streaming_llm = None
         logger.info("Generator updated with new configuration.")
 
     def get_config(self) -> dict:
@@ -84,13 +136,4 @@ class Generator:
         }
     def _get_system_prompt(self) -> str:
         """Get system prompt for medical assistant"""
-        return """
-        You are a helpful medical assistant. Provide accurate, informative responses 
-        based on the given context. Always:
-
-        1. Base your answers on the provided context
-        2. Be clear and professional
-        3. Include disclaimers when appropriate
-        4. Suggest consulting healthcare professionals for serious concerns
-        5. Cite sources when possible
-        """
\ No newline at end of file
+        return _SYSTEM_PROMPT
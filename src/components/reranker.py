@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import time
+import streamlit as st
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from langchain_cohere import CohereRerank
+from langchain_core.documents import Document
+from config.settings import get_settings
+from src.utils.logger import logger
+
+
+class Reranker:
+    """Reorders retrieved chunks with Cohere's rerank model, caching scores per (query, chunk)."""
+
+    def __init__(self, ttl: Optional[int] = None, cache_size: int = 4096):
+        self.settings = get_settings()
+        self.model_name = self.settings.rerank_model
+        self.ttl = ttl if ttl is not None else self.settings.rerank_cache_ttl
+        if st.session_state.get("cohere_api_key"):
+            self.cohere_api_key = st.session_state["cohere_api_key"]
+        else:
+            self.cohere_api_key = self.settings.cohere_api_key
+
+        self.reranker = CohereRerank(
+            cohere_api_key=self.cohere_api_key,
+            model=self.model_name
+        )
+        # LRU of (query digest, chunk content digest) -> (score, time scored); entries past the TTL are dropped when read
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, bytes], Tuple[float, float]]" = OrderedDict()
+        # The app shares one reranker between session threads
+        self._lock = threading.Lock()
+        logger.info(f"Cohere reranker initialized with model: {self.model_name}")
+
+    @staticmethod
+    def _chunk_key(doc: Document) -> bytes:
+        # The score depends only on the text: a re-uploaded file with the same name and
+        # chunk ids but edited content must be rescored
+        return hashlib.blake2b(doc.page_content.encode('utf-8'), digest_size=16).digest()
+
+    def _cached_score(self, key: Tuple, now: float) -> Optional[float]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] >= self.ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[0]
+
+    def rerank(self, query: str, docs: List[Tuple[Document, float]], top_n: int) -> List[Tuple[Document, float]]:
+        """Return the top_n docs by rerank relevance score (higher is more relevant)"""
+        if not docs:
+            return []
+        now = time.time()
+        query_key = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        keys = [(query_key, self._chunk_key(doc)) for doc, _ in docs]
+        with self._lock:
+            scores = [self._cached_score(key, now) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            results = self.reranker.rerank([docs[i][0].page_content for i in missing], query, top_n=None)
+            with self._lock:
+                for result in results:
+                    i = missing[result["index"]]
+                    scores[i] = result["relevance_score"]
+                    self._cache[keys[i]] = (scores[i], now)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        logger.info("Reranked {} candidates ({} cached) to top {}", len(docs), len(docs) - len(missing), top_n)
+
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score is not None),
+            key=lambda i: scores[i],
+            reverse=True
+        )[:top_n]
+        return [(docs[i][0], scores[i]) for i in ranked]
@@ -1,9 +1,22 @@
 import numpy as np
+from bisect import bisect_right
+from itertools import accumulate
 from typing import List, Tuple
 from langchain_core.documents import Document
-from src.utils.logger import logger
+from src.utils.logger import is_enabled, logger
 from src.components.embedding import EmbeddingModel
 from src.components.vector_store import VectorStore
+from src.utils.simkernels import batched_cosine
+
+_CONTEXT_BLOCK = "[Source: {}]\n{}\n"
+_BLOCK_OVERHEAD = len(_CONTEXT_BLOCK.format("", ""))
+
+def _rank_listing(results: List[Tuple[Document, float]]) -> str:
+    lines = []
+    for i, (doc, score) in enumerate(results, 1):
+        meta = doc.metadata
+        lines.append(f"  - Rank {i}: {meta.get('source', 'Unknown')} [Chunk: {meta.get('chunk_id', 'N/A')}] (Score: {score:.4f})")
+    return "\n".join(lines)
 
 class Retriever:
     def __init__(self, store_manager: VectorStore):
@@ -14,48 +27,76 @@ class Retriever:
         vector_store = self.store.get_vector_store()
         if not vector_store:
             raise ValueError("Vector store not initialized.")
-        logger.info(f"Searching top {k} documents for query: {query[:50]}...")
-        results = vector_store.similarity_search_with_score(query, k=k)
-        for i, (doc, score) in enumerate(results):
-            logger.debug(f"  - Rank {i+1}: Score={score:.4f}, Source={doc.metadata.get('source', 'Unknown')}")
+        logger.info("Searching top {} documents for query: {:.50}...", k, query)
+        # Embed through EmbeddingModel so repeated queries are served from its cache
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, query_vector: List[float], k: int = 3) -> List[Tuple[Document, float]]:
+        vector_store = self.store.get_vector_store()
+        if not vector_store:
+            raise ValueError("Vector store not initialized.")
+        results = vector_store.similarity_search_with_score_by_vector(query_vector, k=k)
+        # The listing is only built when DEBUG is enabled, as one record for all ranks
+        if is_enabled("DEBUG"):
+            logger.debug("Retrieved {} documents:\n{}", len(results), _rank_listing(results))
+        return results
+
+    def similarity_search_batch(self, queries: List[str], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        """One embedding request and one FAISS search for all queries, instead of one of each per query"""
+        if not self.store.get_vector_store():
+            raise ValueError("Vector store not initialized.")
+        return self.similarity_search_batch_by_vector(self.embeddings.embed_queries(queries), k=k)
+
+    def similarity_search_batch_by_vector(self, query_vectors: List[List[float]], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        results = self.store.similarity_search_batch(query_vectors, k=k)
+        logger.info("Batch searched top {} documents for {} queries", k, len(results))
         return results
 
     def similarity_search_with_threshold(self, query: str, k: int = 3, threshold: float = 0.7) -> List[Tuple[Document, float]]:
-        results = self.similarity_search(query, k=k * 2)
-        filtered = [(doc, score) for doc, score in results if score <= threshold][:k]
-        logger.info(f"Filtered to {len(filtered)} results under threshold {threshold}")
+        if not self.store.get_vector_store():
+            raise ValueError("Vector store not initialized.")
+        query_vector = self.embeddings.embed_query(query)
+        try:
+            # Exactly the documents within the threshold, rather than 2k candidates filtered after
+            filtered = self.store.similarity_search_range(query_vector, threshold)[:k]
+            logger.info("Range search kept {} results within threshold {}", len(filtered), threshold)
+            return filtered
+        except RuntimeError:
+            # Index types without range_search in FAISS
+            pass
+        results = self.similarity_search_by_vector(query_vector, k=k * 2)
+        if self.store.scores_are_similarities:
+            filtered = [(doc, score) for doc, score in results if score >= threshold][:k]
+        else:
+            filtered = [(doc, score) for doc, score in results if score <= threshold][:k]
+        logger.info("Filtered to {} results against threshold {}", len(filtered), threshold)
         return filtered
 
     def get_relevant_context(self, query: str, k: int = 3, max_context_length: int = 4000) -> str:
         results = self.similarity_search(query, k=k)
-        context_parts, total_len = [], 0
-
-        for doc, _ in results:
-            content = doc.page_content.strip()
-            source = doc.metadata.get('source', 'Unknown')
-            block = f"[Source: {source}]\n{content}\n"
-            if total_len + len(block) > max_context_length:
-                space_left = max_context_length - total_len
-                if space_left > 100:
-                    context_parts.append(block[:space_left - 3] + "...")
-                break
-            context_parts.append(block)
-            total_len += len(block)
+        parts = [(str(doc.metadata.get('source', 'Unknown')), doc.page_content.strip()) for doc, _ in results]
+        # Block lengths are known before formatting, so discarded blocks are never built
+        ends = list(accumulate(_BLOCK_OVERHEAD + len(source) + len(content) for source, content in parts))
+        fit = bisect_right(ends, max_context_length)
+        context_parts = [_CONTEXT_BLOCK.format(source, content) for source, content in parts[:fit]]
+        if fit < len(parts):
+            space_left = max_context_length - (ends[fit - 1] if fit else 0)
+            if space_left > 100:
+                context_parts.append(_CONTEXT_BLOCK.format(*parts[fit])[:space_left - 3] + "...")
 
         final_context = "\n".join(context_parts)
-        logger.info(f"Context length: {len(final_context)} characters from {len(context_parts)} docs")
+        logger.info("Context length: {} characters from {} docs", len(final_context), len(context_parts))
         return final_context
 
     def calculate_similarity_threshold(self, query: str, sample_docs: List[str], percentile: float = 75) -> float:
         if not sample_docs:
             return 0.7
         try:
-            q_vec = self.embeddings.embed_query(query)
-            scores = []
-            for doc in sample_docs:
-                d_vec = self.embeddings.embed_query(doc)
-                sim = np.dot(q_vec, d_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(d_vec))
-                scores.append(sim)
+            q_vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            # One batched embedding request instead of one per sample doc
+            d_vecs = np.ascontiguousarray(self.embeddings.embed_documents(sample_docs), dtype=np.float32)
+            # SimSIMD or numba kernel when installed, NumPy GEMV otherwise
+            scores = batched_cosine(d_vecs, q_vec)
             threshold = np.percentile(scores, percentile)
             return float(threshold)
         except Exception as e:
@@ -0,0 +1,69 @@
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+from src.utils.logger import logger
+
+
+class SemanticCache:
+    """Answer cache for near-duplicate queries.
+
+    Entries are grouped by namespace; a lookup compares the query embedding against
+    every live entry of its namespace with one matrix-vector product and returns a
+    cached value when cosine similarity reaches the threshold. The per-namespace cap
+    keeps that scan small, and unlike hashing into LSH buckets it never misses a
+    near-duplicate that fell on the other side of a hyperplane.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: int = 3600,
+                 max_namespaces: int = 64, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_namespaces = max_namespaces
+        self.max_entries = max_entries
+        # The pipeline holding this cache is shared between session threads
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, List[Tuple[np.ndarray, Any, float]]]" = OrderedDict()
+
+    def _unit(self, vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, namespace: Hashable, vector: Sequence[float]) -> Optional[Any]:
+        unit = self._unit(vector)
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if not entries:
+                return None
+
+            now = time.time()
+            entries[:] = [entry for entry in entries if now - entry[2] < self.ttl]
+            if not entries:
+                del self._entries[namespace]
+                return None
+
+            sims = np.stack([entry[0] for entry in entries]) @ unit
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            self._entries.move_to_end(namespace)
+            logger.info("Semantic cache hit (similarity {:.3f})", sims[best])
+            return entries[best][1]
+
+    def put(self, namespace: Hashable, vector: Sequence[float], value: Any) -> None:
+        unit = self._unit(vector)
+        with self._lock:
+            entries = self._entries.setdefault(namespace, [])
+            entries.append((unit, value, time.time()))
+            if len(entries) > self.max_entries:
+                # Oldest entries go first
+                del entries[:-self.max_entries]
+            self._entries.move_to_end(namespace)
+            while len(self._entries) > self.max_namespaces:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,13 +1,133 @@
+import hashlib
+import itertools
+import json
 import os
 import pickle
 import shutil
-from typing import List, Optional
+import uuid
+from collections.abc import Sequence
+import faiss
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from src.utils.logger import logger
 from src.components.embedding import EmbeddingModel
 from config.settings import get_settings
 
+# Process-unique store ids; id() can be reused once a session's store is collected
+_STORE_TOKENS = itertools.count()
+
+# HNSW graph parameters: neighbours per node, build-time and query-time beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# From this many vectors on, IVF-PQ replaces HNSW: sqrt(N)-scaled coarse clusters, nprobe of them
+# scanned per query, each vector stored as PQ_M one-byte codes instead of 4*d bytes of floats
+IVFPQ_MIN_VECTORS = 10_000
+IVF_NPROBE = 16
+PQ_M = 64
+# Scalar quantizers for the vectors stored in the HNSW graph; "none" keeps full float32
+SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+# Float32 embedding matrix saved next to the FAISS index, row i matching document i. Holds the
+# exact (normalized) embeddings; only stores saved without it fall back to the index's reconstruction
+VECTORS_FILE = "vectors.npy"
+# Documents as one .npy per column (UTF-8 bytes plus offsets), memory-mapped on load;
+# replaces the legacy documents.pkl
+DOCUMENTS_DIR = "documents"
+DOCUMENT_COLUMNS = ("content", "content_offsets", "meta", "meta_offsets")
+# Same columns in a single archive, as saved before DOCUMENTS_DIR; arrays inside an .npz cannot be mapped
+LEGACY_DOCUMENTS_FILE = "documents.npz"
+# Files written by FAISS.save_local: the raw index and the pickled (docstore, id map) pair
+INDEX_FILE = "index.faiss"
+INDEX_META_FILE = "index.pkl"
+# Index storage (flat codes, IVF lists) is mapped from the file and paged in on demand. Adding
+# IO_FLAG_MMAP routes IVF lists through OnDiskInvertedLists, which cannot read IVF-PQ files
+MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+def _pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate strings into one uint8 buffer with an offsets array of len(strings) + 1"""
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _save_array(path: str, array: np.ndarray) -> None:
+    """Write via a temp file and rename, so arrays still mapped from the old file stay valid"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+def _unpack_string(buf: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return buf[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+class _ColumnarDocuments(Sequence):
+    """View over saved document columns; Documents are built on first access.
+
+    Documents added after loading are appended as-is after the saved ones.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], columns_dir: Optional[str] = None):
+        self._columns = columns
+        # Set when the columns are memory-mapped from .npy files in this directory
+        self._columns_dir = columns_dir
+        self._saved = len(columns['content_offsets']) - 1
+        self._docs: List[Optional[Document]] = [None] * self._saved
+
+    @classmethod
+    def open(cls, columns_dir: str) -> "_ColumnarDocuments":
+        """Map the column files of a saved store; a document's bytes are paged in when first accessed"""
+        return cls({
+            name: np.load(os.path.join(columns_dir, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+            for name in DOCUMENT_COLUMNS
+        }, columns_dir)
+
+    def __reduce__(self):
+        # A mapped view pickles as its directory and is re-mapped on unpickling; pickling the
+        # memmaps themselves would copy every column into the pickle
+        if len(self._docs) > self._saved:
+            return (list, (list(self),))
+        if self._columns_dir is not None:
+            return (_ColumnarDocuments.open, (self._columns_dir,))
+        return (_ColumnarDocuments, (self._columns,))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        doc = self._docs[i]
+        if doc is None:
+            cols = self._columns
+            doc = Document(
+                page_content=_unpack_string(cols['content'], cols['content_offsets'], i),
+                metadata=json.loads(_unpack_string(cols['meta'], cols['meta_offsets'], i))
+            )
+            self._docs[i] = doc
+        return doc
+
+    def extend(self, documents: List[Document]) -> None:
+        self._docs.extend(documents)
+
+
+
+def _use_cosine(store: FAISS) -> FAISS:
+    """Make the wrapper normalize query and added vectors for an inner-product index.
+
+    Set after construction: LangChain warns when normalize_L2 is combined with
+    MAX_INNER_PRODUCT, though it is exactly what cosine similarity needs.
+    """
+    store.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+    store._normalize_L2 = True
+    return store
+
 
 class VectorStore:
     def __init__(self, store_path: str = "data/vector_db"):
@@ -17,6 +137,13 @@ class VectorStore:
         self.embedding_model_name = self.settings.embedding_model_name
         self.vector_store = None
         self.documents = []
+        self.vectors: Optional[np.ndarray] = None
+        # Set while the index is memory-mapped read-only from this file
+        self._mapped_index_path: Optional[str] = None
+        # Bumped whenever the stored documents change, so downstream caches can invalidate
+        self.version = 0
+        # Never reused, so (cache_token, version) names exactly one store state
+        self.cache_token = next(_STORE_TOKENS)
         self.store_path = store_path
         os.makedirs(self.store_path, exist_ok=True)
         logger.info(f"VectorStore initialized with model: {self.embedding_model_name}")
@@ -24,43 +151,179 @@ class VectorStore:
     def create(self, documents: List[Document]) -> None:
         if not documents:
             raise ValueError("No documents provided for vector store creation")
-        self.documents = documents
-        self.vector_store = FAISS.from_documents(documents, self.embeddings)
+        # Own list, so add_documents can extend it without touching the caller's
+        self.documents = list(documents)
+        self._mapped_index_path = None
+        self.version += 1
+        vectors = self._embed_unique([doc.page_content for doc in documents])
+        # Unit-length rows make inner product equal cosine similarity
+        faiss.normalize_L2(vectors)
+        self.vectors = vectors
+        ids = [str(uuid.uuid4()) for _ in documents]
+        self.vector_store = _use_cosine(FAISS(
+            embedding_function=self.embeddings,
+            index=self._build_index(vectors),
+            docstore=InMemoryDocstore(dict(zip(ids, documents))),
+            index_to_docstore_id=dict(enumerate(ids)),
+        ))
         logger.info(f"Vector store created with {len(documents)} documents")
 
+    def _embed_unique(self, texts: List[str]) -> np.ndarray:
+        """Embed each distinct text once; repeated boilerplate reuses the same row"""
+        slots: Dict[bytes, int] = {}
+        unique_texts = []
+        inverse = np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(unique_texts)
+                unique_texts.append(text)
+            inverse[i] = slot
+        if len(unique_texts) < len(texts):
+            logger.info(f"Embedding {len(unique_texts)} unique texts for {len(texts)} documents")
+        unique_vectors = np.asarray(self.embeddings.embed_documents(unique_texts), dtype=np.float32)
+        if len(unique_texts) == len(texts):
+            # Already one row per text in order; skip the gather copy
+            return unique_vectors
+        return unique_vectors[inverse]
+
+    def _build_index(self, vectors: np.ndarray) -> faiss.Index:
+        """Inner-product index over normalized vectors, chosen by corpus size.
+
+        Below IVFPQ_MIN_VECTORS (10k): an HNSW graph, scalar-quantized if configured, for
+        ~log(N) search instead of the O(N) scan of IndexFlatL2. From there on: IVF-PQ,
+        which keeps memory bounded by storing compressed codes instead of full vectors.
+        """
+        if len(vectors) >= IVFPQ_MIN_VECTORS:
+            return self._build_ivfpq_index(vectors)
+        qtype = SQ_TYPES.get(self.settings.faiss_quantization)
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            # 2x (fp16) or 4x (int8) smaller vectors; int8 learns per-dimension ranges
+            index = faiss.IndexHNSWSQ(vectors.shape[1], qtype, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    def _build_ivfpq_index(self, vectors: np.ndarray) -> faiss.Index:
+        """IVF-PQ index for large corpora, where HNSW's full-precision graph gets too big"""
+        n, d = vectors.shape
+        nlist = int(4 * np.sqrt(n))
+        # PQ needs the sub-quantizer count to divide the dimension
+        m = next(m for m in range(min(PQ_M, d), 0, -1) if d % m == 0)
+        index = faiss.index_factory(d, f"IVF{nlist},PQ{m}x8", faiss.METRIC_INNER_PRODUCT)
+        # The factory enables polysemous training, which only helps Hamming-filtered search and
+        # dominates train time
+        index.do_polysemous_training = False
+        index.train(vectors)
+        index.add(vectors)
+        # Lets get_vectors() reconstruct rows by position
+        index.make_direct_map()
+        index.nprobe = IVF_NPROBE
+        logger.info(f"Built IVF-PQ index: {nlist} lists, {m} codes per vector")
+        return index
+
     def add_documents(self, documents: List[Document]) -> None:
         if not self.vector_store:
             logger.warning("No existing vector store. Creating a new one.")
             self.create(documents)
             return
-        self.vector_store.add_documents(documents)
+        # Same pre-embedding as create(): duplicates are embedded once, and the Cohere client
+        # splits the request into 96-text batches sent concurrently
+        texts = [doc.page_content for doc in documents]
+        vectors = self._embed_unique(texts)
+        if self.scores_are_similarities:
+            faiss.normalize_L2(vectors)
+        self._unmap_index()
+        self.vector_store.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in documents])
+        # O(new documents): appended in place, without materialising a loaded store's lazy documents
         self.documents.extend(documents)
+        # Appended rather than reconstructed from the index, whose SQ/PQ codes are lossy
+        if self.vectors is not None:
+            self.vectors = np.vstack((self.vectors, vectors))
+        self.version += 1
         logger.info(f"Added {len(documents)} documents. Total now: {len(self.documents)}")
 
     def save(self, path: Optional[str] = None) -> None:
         if not self.vector_store:
             raise ValueError("No vector store to save.")
         path = path or os.path.join(self.store_path, "faiss_index")
+        # Rewriting the file the index is mapped from would pull the pages out from under it
+        self._unmap_index()
         self.vector_store.save_local(path)
-        with open(os.path.join(path, "documents.pkl"), 'wb') as f:
-            pickle.dump(self.documents, f)
+        self._save_documents(path)
+        vectors = self.get_vectors()
+        if vectors is not None:
+            _save_array(os.path.join(path, VECTORS_FILE), np.ascontiguousarray(vectors, dtype=np.float32))
         logger.info(f"Vector store saved at {path}")
 
-    def load(self, path: Optional[str] = None) -> None:
-        path = path or os.path.join(self.store_path, "faiss_index")
-        if not os.path.exists(path):
-            logger.warning(f"No vector store found at {path}")
+    def _save_documents(self, path: str) -> None:
+        content, content_offsets = _pack_strings([doc.page_content for doc in self.documents])
+        meta, meta_offsets = _pack_strings([json.dumps(doc.metadata, default=str) for doc in self.documents])
+        columns = dict(zip(DOCUMENT_COLUMNS, (content, content_offsets, meta, meta_offsets)))
+        columns_dir = os.path.join(path, DOCUMENTS_DIR)
+        os.makedirs(columns_dir, exist_ok=True)
+        for name, array in columns.items():
+            _save_array(os.path.join(columns_dir, f"{name}.npy"), array)
+
+    def _load_documents(self, path: str) -> None:
+        columns_dir = os.path.join(path, DOCUMENTS_DIR)
+        if os.path.isdir(columns_dir):
+            # Plain numeric arrays, mapped rather than read, so nothing is unpickled
+            self.documents = _ColumnarDocuments.open(columns_dir)
+            return
+        legacy_path = os.path.join(path, LEGACY_DOCUMENTS_FILE)
+        if os.path.exists(legacy_path):
+            with np.load(legacy_path, allow_pickle=False) as data:
+                self.documents = _ColumnarDocuments({name: data[name] for name in data.files})
             return
-        self.vector_store = FAISS.load_local(path, embeddings=self.embeddings, allow_dangerous_deserialization=True)
         docs_path = os.path.join(path, "documents.pkl")
         if os.path.exists(docs_path):
+            # Stores saved before the columnar format
             with open(docs_path, 'rb') as f:
                 self.documents = pickle.load(f)
+
+    def load(self, path: Optional[str] = None) -> None:
+        path = path or os.path.join(self.store_path, "faiss_index")
+        if not os.path.exists(path):
+            logger.warning(f"No vector store found at {path}")
+            return
+        self.vector_store = self._read_store(path)
+        # save_local does not record the metric; stores saved before the switch to cosine stay L2
+        if self.vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            _use_cosine(self.vector_store)
+        self._load_documents(path)
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        # Memory-mapped: rows are paged in only when read, nothing is re-embedded
+        self.vectors = np.load(vectors_path, mmap_mode='r') if os.path.exists(vectors_path) else None
+        self.version += 1
         logger.info(f"Loaded vector store from {path}. Docs: {len(self.documents)}")
 
+    def _read_store(self, path: str) -> FAISS:
+        """FAISS.load_local, but with the index memory-mapped instead of read into memory"""
+        index_path = os.path.join(path, INDEX_FILE)
+        index = faiss.read_index(index_path, MMAP_FLAGS)
+        self._mapped_index_path = index_path
+        with open(os.path.join(path, INDEX_META_FILE), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+    def _unmap_index(self) -> None:
+        """Replace a memory-mapped (read-only) index with an in-memory copy before it is modified"""
+        if self._mapped_index_path:
+            self.vector_store.index = faiss.read_index(self._mapped_index_path)
+            self._mapped_index_path = None
+
     def delete(self) -> None:
         self.vector_store = None
         self.documents = []
+        self.vectors = None
+        self._mapped_index_path = None
+        self.version += 1
         path = os.path.join(self.store_path, "faiss_index")
         if os.path.exists(path):
             shutil.rmtree(path)
@@ -69,12 +332,61 @@ class VectorStore:
     def get_documents(self) -> List[Document]:
         return self.documents
 
+    def similarity_search_batch(self, query_vectors: List[List[float]], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        """Search many query vectors with one FAISS call; same (doc, score) pairs as per-query search"""
+        if not self.vector_store:
+            raise ValueError("Vector store not initialized.")
+        queries = np.array(query_vectors, dtype=np.float32)
+        if self.scores_are_similarities:
+            faiss.normalize_L2(queries)
+        distances, indices = self.vector_store.index.search(queries, k)
+        id_map = self.vector_store.index_to_docstore_id
+        docstore = self.vector_store.docstore
+        # FAISS pads with -1 when the index holds fewer than k vectors
+        return [
+            [(docstore.search(id_map[i]), float(d)) for d, i in zip(row_d, row_i) if i != -1]
+            for row_d, row_i in zip(distances, indices)
+        ]
+
+    def similarity_search_range(self, query_vector: List[float], threshold: float) -> List[Tuple[Document, float]]:
+        """Every document within threshold (similarity above it, or L2 distance below it), best first"""
+        if not self.vector_store:
+            raise ValueError("Vector store not initialized.")
+        query = np.array([query_vector], dtype=np.float32)
+        if self.scores_are_similarities:
+            faiss.normalize_L2(query)
+        _, scores, ids = self.vector_store.index.range_search(query, threshold)
+        order = np.argsort(-scores if self.scores_are_similarities else scores, kind='stable')
+        id_map = self.vector_store.index_to_docstore_id
+        docstore = self.vector_store.docstore
+        return [(docstore.search(id_map[ids[j]]), float(scores[j])) for j in order]
+
+    @property
+    def scores_are_similarities(self) -> bool:
+        """True when search scores are cosine similarities (higher is closer), False for legacy L2 distances"""
+        if self.vector_store is None:
+            return True
+        return self.vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+    def get_vectors(self) -> Optional[np.ndarray]:
+        """Embedding matrix of the stored documents.
+
+        Exact as embedded; a store loaded without vectors.npy reconstructs it from the index
+        instead, which is approximate for quantized (SQ, IVF-PQ) indexes.
+        """
+        if self.vectors is None and self.vector_store is not None:
+            index = self.vector_store.index
+            self.vectors = index.reconstruct_n(0, index.ntotal)
+        return self.vectors
+
     def get_vector_store(self):
         return self.vector_store
 
     def get_embedding_dim(self) -> int:
         if self.vector_store:
             return self.vector_store.index.d
-        return len(self.embeddings.embed_query("test"))
+        if self.vectors is not None:
+            return self.vectors.shape[1]
+        return self.embedding_model.dim()
     def get_document_count(self) -> int:
         return len(self.documents) if self.documents else 0
@@ -1,12 +1,26 @@
+import asyncio
+import re
+import threading
 import time
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 from langchain_core.documents import Document
 from src.components.generator import Generator
+from src.components.reranker import Reranker
+from src.components.semantic_cache import SemanticCache
 from src.components.retriever import Retriever
 from src.components.vector_store import VectorStore
 from src.utils.logger import logger
 from config.settings import get_settings
 
+# Retrievers kept alive per vector store; each one pins its store and embedding client
+_MAX_CACHED_RETRIEVERS = 8
+# Rule framing the document blocks in the prompt context
+_CONTEXT_RULE = "\n" + "=" * 80
+# Any of these phrases counts as a disclaimer; one case-insensitive pass instead of lowering the response per phrase
+_DISCLAIMER_PHRASES = ("consult", "doctor", "healthcare", "medical advice")
+_DISCLAIMER_RE = re.compile("|".join(map(re.escape, _DISCLAIMER_PHRASES)), re.IGNORECASE)
+
 class RAGPipeline:
     """Complete RAG pipeline for medical question answering."""
 
@@ -15,71 +29,195 @@ class RAGPipeline:
         self.generator = Generator()
         self.temperature = self.settings.temperature
         self.top_k = self.settings.retrieval_k
+        self._reranker: Optional[Reranker] = None
+        self._retrievers: "OrderedDict[int, Retriever]" = OrderedDict()
+        # The app shares one pipeline between session threads
+        self._lock = threading.Lock()
+        self.semantic_cache: Optional[SemanticCache] = None
+        if self.settings.semantic_cache_enabled:
+            self.semantic_cache = SemanticCache(
+                threshold=self.settings.semantic_cache_threshold,
+                ttl=self.settings.semantic_cache_ttl
+            )
+
+    @property
+    def reranker(self) -> Reranker:
+        # Only built when reranking is first requested
+        with self._lock:
+            if self._reranker is None:
+                self._reranker = Reranker()
+            return self._reranker
 
-    def _load_retriever(self):
-        pass 
+    def _get_retriever(self, vectorstore: VectorStore) -> Retriever:
+        """Reuse one Retriever (and its embedding client) per vector store"""
+        key = id(vectorstore)
+        with self._lock:
+            retriever = self._retrievers.get(key)
+            if retriever is None or retriever.store is not vectorstore:
+                retriever = Retriever(store_manager=vectorstore)
+                self._retrievers[key] = retriever
+                if len(self._retrievers) > _MAX_CACHED_RETRIEVERS:
+                    self._retrievers.popitem(last=False)
+            else:
+                self._retrievers.move_to_end(key)
+            return retriever
     
         
+    def _retrieve(self, query: str, vectorstore: VectorStore, top_k: int,
+                  rerank: bool, k_candidates: Optional[int],
+                  query_vector: Optional[List[float]]) -> List[Tuple[Document, float]]:
+        retriever = self._get_retriever(vectorstore)
+        search_k = max(k_candidates or self.settings.rerank_candidates, top_k) if rerank else top_k
+        if query_vector is not None:
+            retrieved = retriever.similarity_search_by_vector(query_vector, k=search_k)
+        else:
+            retrieved = retriever.similarity_search(query, k=search_k)
+        if rerank:
+            # Retrieved wide; keep only the top_k chunks the reranker scores highest
+            retrieved = self.reranker.rerank(query, retrieved, top_n=top_k)
+        return retrieved
+
+    def _cache_lookup(self, query: str, vectorstore: VectorStore, top_k: int, rerank: bool,
+                      temperature: Optional[float], query_vector: Optional[List[float]]) -> Tuple[Optional[Tuple], Optional[Dict]]:
+        """Return (cache key, cached response) for a query; the key is None when caching is off"""
+        if self.semantic_cache is None:
+            return None, None
+        if query_vector is None:
+            query_vector = self._get_retriever(vectorstore).embeddings.embed_query(query)
+        # Answers are only reusable against the same store contents, retrieval settings and model
+        namespace = (vectorstore.cache_token, vectorstore.version, top_k, rerank, temperature, self.generator.model_name)
+        return (namespace, query_vector), self.semantic_cache.get(namespace, query_vector)
+
+    def _cached_response(self, cached: Dict, start: float) -> Dict:
+        return {
+            **cached,
+            "metadata": {**cached["metadata"], "cache_hit": True, "total_time": time.time() - start}
+        }
+
+    def _empty_response(self, start: float, retrieval_time: float) -> Dict:
+        return {
+            "answer": "I couldn't find any relevant information...",
+            "sources": [],
+            "metadata": {
+                "retrieved_docs": 0,
+                "retrieval_time": retrieval_time,
+                "generation_time": 0,
+                "total_time": time.time() - start
+            }
+        }
+
+    def _answer_response(self, answer: str, retrieved: List[Tuple[Document, float]], context: str,
+                         start: float, retrieval_time: float,
+                         temperature: Optional[float], rerank: bool) -> Dict:
+        total_time = time.time() - start
+        return {
+            "answer": answer,
+            "sources": retrieved,
+            "context": context,
+            "metadata": {
+                "retrieved_docs": len(retrieved),
+                "retrieval_time": retrieval_time,
+                "generation_time": total_time - retrieval_time,
+                "total_time": total_time,
+                "model": self.generator.model_name,
+                "temperature": temperature or self.generator.temperature,
+                "reranked": rerank
+            }
+        }
+
+    def _error_response(self, error: Exception, start: float) -> Dict:
+        logger.error(f"Error in RAG pipeline: {error}")
+        return {
+            "answer": f"I encountered an error: {str(error)}",
+            "sources": [],
+            "metadata": {
+                "error": str(error),
+                "total_time": time.time() - start
+            }
+        }
+
     def generate_response(self, query: str,
                             vectorstore: VectorStore,                          
-                          temperature: Optional[float] = None) -> Dict:
+                          temperature: Optional[float] = None,
+                          rerank: bool = False,
+                          k_candidates: Optional[int] = None,
+                          k: Optional[int] = None,
+                          query_vector: Optional[List[float]] = None) -> Dict:
         start = time.time()
         try:
-            retriever = Retriever(store_manager=vectorstore)
-            retrieved = retriever.similarity_search(query, k=self.top_k)
+            top_k = k or self.top_k
+            cache_key, cached = self._cache_lookup(query, vectorstore, top_k, rerank, temperature, query_vector)
+            if cached is not None:
+                return self._cached_response(cached, start)
+            if cache_key is not None:
+                query_vector = cache_key[1]
+
+            retrieved = self._retrieve(query, vectorstore, top_k, rerank, k_candidates, query_vector)
             retrieval_time = time.time() - start
 
             if not retrieved:
-                return {
-                    "answer": "I couldn't find any relevant information...",
-                    "sources": [],
-                    "metadata": {
-                        "retrieved_docs": 0,
-                        "retrieval_time": retrieval_time,
-                        "generation_time": 0,
-                        "total_time": time.time() - start
-                    }
-                }
+                return self._empty_response(start, retrieval_time)
 
             context = self._prepare_context(retrieved)
-            if temperature and temperature != self.generator.temperature:
-                self.generator.update(temperature=self.temperature)
-                answer = self.generator.generate(query, context)
+            answer = self.generator.generate(query, context, temperature=temperature)
+
+            response = self._answer_response(answer, retrieved, context, start, retrieval_time, temperature, rerank)
+            if cache_key is not None:
+                self.semantic_cache.put(*cache_key, response)
+            return response
+
+        except Exception as e:
+            return self._error_response(e, start)
+
+    async def agenerate_response(self, query: str,
+                                 vectorstore: VectorStore,
+                                 temperature: Optional[float] = None,
+                                 rerank: bool = False,
+                                 k_candidates: Optional[int] = None,
+                                 k: Optional[int] = None,
+                                 query_vector: Optional[List[float]] = None,
+                                 prefetched: Optional[List[Tuple[Document, float]]] = None) -> Dict:
+        """Async counterpart of generate_response; the LLM call is awaited.
+
+        `prefetched` holds search results already fetched for this query (e.g. by a
+        batched search), used instead of searching again when not reranking.
+        """
+        start = time.time()
+        try:
+            top_k = k or self.top_k
+            cache_key, cached = self._cache_lookup(query, vectorstore, top_k, rerank, temperature, query_vector)
+            if cached is not None:
+                return self._cached_response(cached, start)
+            if cache_key is not None:
+                query_vector = cache_key[1]
+
+            if prefetched is not None and not rerank:
+                retrieved = prefetched
             else:
-                answer = self.generator.generate(query, context)
-
-            total_time = time.time() - start
-            return {
-                "answer": answer,
-                "sources": retrieved,
-                "context": context,
-                "metadata": {
-                    "retrieved_docs": len(retrieved),
-                    "retrieval_time": retrieval_time,
-                    "generation_time": total_time - retrieval_time,
-                    "total_time": total_time,
-                    "model": self.generator.model_name,
-                    "temperature": temperature or self.generator.temperature
-                }
-            }
+                retrieved = self._retrieve(query, vectorstore, top_k, rerank, k_candidates, query_vector)
+            retrieval_time = time.time() - start
+
+            if not retrieved:
+                return self._empty_response(start, retrieval_time)
+
+            context = self._prepare_context(retrieved)
+            answer = await self.generator.agenerate(query, context, temperature=temperature)
+
+            response = self._answer_response(answer, retrieved, context, start, retrieval_time, temperature, rerank)
+            if cache_key is not None:
+                self.semantic_cache.put(*cache_key, response)
+            return response
 
         except Exception as e:
-            logger.error(f"Error in RAG pipeline: {e}")
-            return {
-                "answer": f"I encountered an error: {str(e)}",
-                "sources": [],
-                "metadata": {
-                    "error": str(e),
-                    "total_time": time.time() - start
-                }
-            }
+            return self._error_response(e, start)
 
     def _prepare_context(self, docs: List[Tuple[Document, float]]) -> str:
-        parts = []
-        for i, (doc, score) in enumerate(docs, 1):
-            src = doc.metadata.get('source', 'Unknown')
-            parts.append(f"\nDocument {i} (Source: {src}, Score: {score:.3f}):\n{doc.page_content.strip()}")
-        return "\n" + "="*80 + "\n".join(parts) + "\n" + "="*80
+        # A list, not a generator: join() would materialise one anyway to size its result
+        body = "\n".join([
+            f"\nDocument {i} (Source: {doc.metadata.get('source', 'Unknown')}, Score: {score:.3f}):\n{doc.page_content.strip()}"
+            for i, (doc, score) in enumerate(docs, 1)
+        ])
+        return _CONTEXT_RULE + body + _CONTEXT_RULE
 
     def generate_streaming_response(self, query: str, k: int = 3):
         try:
@@ -94,25 +232,43 @@ class RAGPipeline:
             logger.error(f"Streaming generation error: {e}")
             yield f"Error: {str(e)}"
 
-    def batch_generate_responses(self, queries: List[str], k: int = 3) -> List[Dict]:
+    async def abatch_generate_responses(self, queries: List[str], vectorstore: VectorStore, k: int = 3) -> List[Dict]:
+        """Answer queries concurrently; usable from code that already runs an event loop"""
         logger.info(f"Batch generating for {len(queries)} queries")
-        return [self.generate_response(q, self.retriever, k) for q in queries]
+        # One embedding request and one FAISS search for the whole batch, off the event loop thread
+        retriever = self._get_retriever(vectorstore)
+        vectors = await asyncio.to_thread(retriever.embeddings.embed_queries, queries)
+        results = await asyncio.to_thread(retriever.similarity_search_batch_by_vector, vectors, k)
+
+        # LLM calls are I/O-bound: overlap them, bounded by the same limit the app applies
+        semaphore = asyncio.Semaphore(self.settings.max_concurrent_llm)
+
+        async def _bounded(query: str, vector: List[float], retrieved: List[Tuple[Document, float]]) -> Dict:
+            async with semaphore:
+                return await self.agenerate_response(query, vectorstore, k=k, query_vector=vector, prefetched=retrieved)
+
+        return await asyncio.gather(*[_bounded(q, v, r) for q, v, r in zip(queries, vectors, results)])
+
+    def batch_generate_responses(self, queries: List[str], vectorstore: VectorStore, k: int = 3) -> List[Dict]:
+        return asyncio.run(self.abatch_generate_responses(queries, vectorstore, k=k))
 
     def evaluate_response_quality(self, query: str, response: str, sources: List[Tuple[Document, float]]) -> Dict:
         metrics = {
             "response_length": len(response),
             "num_sources_used": len(sources),
             "avg_source_relevance": sum(s for _, s in sources) / len(sources) if sources else 0,
-            "contains_disclaimer": any(p in response.lower() for p in ["consult", "doctor", "healthcare", "medical advice"]),
-            "cites_sources": any(doc.metadata.get('source', '') in response for doc, _ in sources)
+            "contains_disclaimer": _DISCLAIMER_RE.search(response) is not None,
+            # Each distinct source name is searched for once, however many chunks cite it
+            "cites_sources": any(name in response for name in {doc.metadata.get('source', '') for doc, _ in sources})
         }
-        score = sum([
+        # Each passed check adds 0.2; the booleans are summed instead of branched on
+        score = 0.2 * sum((
             metrics["response_length"] > 50,
             metrics["num_sources_used"] >= 2,
             metrics["avg_source_relevance"] > 0.7,
             metrics["contains_disclaimer"],
             metrics["cites_sources"]
-        ]) * 0.2
+        ))
         metrics["quality_score"] = round(score, 2)
         return metrics
 
@@ -125,14 +281,15 @@ class RAGPipeline:
         
         if temperature is not None and temperature != self.temperature:
             self.temperature = temperature
-            updated.append(f"temperature: {temperature}")
+            updated.append(("temperature", temperature))
         
         if k is not None and k != self.top_k:
             self.top_k = k
-            updated.append(f"retrieval_k: {k}")
+            updated.append(("retrieval_k", k))
         
         if updated:
-            logger.info(f"Updated settings: {', '.join(updated)}")
+            # One record for all changes
+            logger.info(f"Updated settings: {', '.join(f'{key}: {value}' for key, value in updated)}")
 
     def get_pipeline_info(self) -> Dict:
         return {
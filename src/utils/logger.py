@@ -1,4 +1,5 @@
 # utils/logger.py
+from functools import lru_cache
 from loguru import logger
 import os
 import sys
@@ -6,16 +7,39 @@ import sys
 from config.settings import get_settings
 settings = get_settings()
 
+# Same fields as loguru's default file format, but a bare {time} renders via datetime.isoformat()
+# instead of loguru's token-by-token time pattern, roughly halving the cost of formatting a record
+FILE_FORMAT = "{time} | {level: <8} | {name}:{function}:{line} - {message}"
+
+# Level name -> whether the configured sinks accept it; refreshed by setup_loguru_logger
+_ENABLED_LEVELS = {}
+
+def is_enabled(level: str) -> bool:
+    """Dict lookup instead of building a lazy logger call, for guarding hot-path log payloads"""
+    return _ENABLED_LEVELS.get(level, True)
+
+# A repeat call with the current configuration is a no-op instead of re-adding sinks and reopening
+# the log file; maxsize=1 so switching back to an earlier configuration still reconfigures
+@lru_cache(maxsize=1)
 def setup_loguru_logger(log_file="logs/app.log", enable_file_logging=settings.enable_file_logging, level="INFO"):
     logger.remove()  # Remove default handlers
+    threshold = logger.level(level).no
+    _ENABLED_LEVELS.clear()
+    _ENABLED_LEVELS.update({name: logger.level(name).no >= threshold
+                            for name in ("TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL")})
+
+    # enqueue=True on both sinks: callers only put the record on a queue and a background thread
+    # does the writes (and rotation), so request handling never blocks on stdout or disk I/O.
+    # loguru's own atexit hook removes the handlers, which drains the queues on shutdown.
 
     # Console logging
-    logger.add(sys.stdout, level=level, format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}")
+    logger.add(sys.stdout, level=level, format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}", enqueue=True)
 
     # File logging (optional)
     if enable_file_logging:
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        logger.add(log_file, level=level, rotation="10 MB", retention="5 days", encoding="utf-8")
+        logger.add(log_file, level=level, format=FILE_FORMAT, rotation="10 MB", retention="5 days",
+                   compression="gz", encoding="utf-8", enqueue=True)
 
     logger.info("Loguru logger initialized.")
 
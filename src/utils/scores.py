@@ -0,0 +1,19 @@
+from typing import List, Sequence
+
+
+def minmax_normalize(scores: Sequence[float], higher_is_better: bool = True) -> List[float]:
+    """Scale scores to [0, 1] so that 1.0 is always the most relevant.
+
+    Raw scores depend on the retriever (L2 distance, cosine, BM25, rerank
+    relevance), so they must be normalized before display or before mixing
+    scores from different retrievers. Distances should pass higher_is_better=False.
+    """
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    span = high - low
+    if higher_is_better:
+        return [(s - low) / span for s in scores]
+    return [(high - s) / span for s in scores]
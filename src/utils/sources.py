@@ -0,0 +1,26 @@
+from collections import namedtuple
+from typing import List, Tuple
+from langchain_core.documents import Document
+from src.utils.scores import minmax_normalize
+
+# Lightweight stand-in for a retrieved (Document, score) pair, kept in chat history
+SourceRef = namedtuple('SourceRef', 'source chunk_id score preview')
+
+PREVIEW_LENGTH = 300
+
+def to_source_refs(sources: List[Tuple[Document, float]], higher_is_better: bool = True) -> List[SourceRef]:
+    """Reduce retrieved chunks to what the UI shows, with the preview pre-truncated.
+
+    Scores are min-max normalized to [0, 1] so relevance reads the same whatever
+    the retriever; pass higher_is_better=False for distance scores.
+    """
+    normalized = minmax_normalize([score for _, score in sources], higher_is_better)
+    return [
+        SourceRef(
+            source=chunk.metadata.get('source', 'Unknown'),
+            chunk_id=chunk.metadata.get('chunk_id'),
+            score=score,
+            preview=chunk.page_content[:PREVIEW_LENGTH]
+        )
+        for (chunk, _), score in zip(sources, normalized)
+    ]
@@ -1,4 +1,5 @@
 import os
+import re
 import pytest
 from unittest.mock import patch, MagicMock
 from src.components.data_processor import DataProcessor
@@ -8,11 +9,23 @@ from langchain_core.documents import Document
 def processor():
     return DataProcessor(chunk_size=100, chunk_overlap=20)
 
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 100), (100, 150), (100, -1), (0, 0)])
+def test_invalid_chunk_settings_rejected(chunk_size, chunk_overlap):
+    with pytest.raises(ValueError):
+        DataProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
 def test_preprocess_text(processor):
     text = "   Hello   World\n\n\tTest\x00ing   "
     clean = processor.preprocess_text(text)
     assert clean == "Hello World Testing"
 
+def test_preprocess_text_strips_bom(processor):
+    assert processor.preprocess_text("\ufeffDose:\u00a0 5\x00mg\r\n") == "Dose: 5mg"
+
+def test_preprocess_text_collapses_unicode_whitespace(processor):
+    text = "a\u2003\u3000b\x1c\x85c\u00a0 \n\u200bd"
+    assert processor.preprocess_text(text) == re.sub(r"\s+", " ", text).strip()
+
 def test_chunk_documents_basic(processor):
     docs = [Document(page_content="This is a test document " * 50)]
     chunks = processor.chunk_documents(docs)
@@ -43,12 +56,13 @@ def test_get_document_stats(processor):
     assert "file1" in stats["sources"]
 
 @patch("src.components.data_processor.DataLoader")
-def test_process_document_mock(mock_loader_class, processor):
+def test_process_document_mock(mock_loader_class):
     mock_loader = MagicMock()
     mock_loader.load.return_value = [
         Document(page_content="sample content")
     ]
     mock_loader_class.return_value = mock_loader
+    processor = DataProcessor(chunk_size=100, chunk_overlap=20)
 
     chunks = processor.process_document("fake/path.txt", source_name="test-source")
     assert all("test-source" == c.metadata["source"] for c in chunks)
@@ -63,4 +77,92 @@ def test_process_multiple_documents(mock_process, processor):
     ]
     result = processor.process_multiple_documents(["file1.txt", "file2.txt"])
     assert len(result) == 3
-    assert result[0].page_content == "doc1"
\ No newline at end of file
+    assert result[0].page_content == "doc1"
+
+
+def test_process_document_uses_chunk_cache(tmp_path):
+    cached_processor = DataProcessor(chunk_size=100, chunk_overlap=20, cache_dir=str(tmp_path / "cache"))
+    path = os.path.abspath("tests/data/test.txt")
+    first = cached_processor.process_document(path, source_name="first")
+
+    with patch.object(cached_processor.loader, "load") as mock_load:
+        second = cached_processor.process_document(path, source_name="second")
+        mock_load.assert_not_called()
+
+    assert [c.page_content for c in second] == [c.page_content for c in first]
+    assert all(c.metadata["source"] == "second" for c in second)
+
+def test_chunk_documents_respects_size_and_overlap(processor):
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = processor.chunk_documents([Document(page_content=text, metadata={"source": "s"})])
+    assert all(len(c.page_content) <= 100 for c in chunks)
+    assert all(c.metadata == {"source": "s"} for c in chunks)
+    # consecutive chunks share some trailing/leading words
+    assert chunks[0].page_content.split()[-1] in chunks[1].page_content
+    # no words lost across the split
+    words = set()
+    for c in chunks:
+        words.update(c.page_content.split())
+    assert words == set(text.split())
+
+def test_process_multiple_documents_parallel(processor):
+    paths = [os.path.abspath("tests/data/test.txt"), os.path.abspath("tests/data/test.pdf")] * 2
+    serial = processor.process_document(paths[0]) + processor.process_document(paths[1])
+
+    result = processor.process_multiple_documents(paths)
+    assert len(result) == 2 * len(serial)
+    assert [c.page_content for c in result] == [c.page_content for c in serial] * 2
+
+def test_process_multiple_documents_parallel_skips_failures(processor):
+    good = os.path.abspath("tests/data/test.txt")
+    paths = [good, "tests/data/missing.txt", good, good]
+    serial = processor.process_document(good)
+
+    result = processor.process_multiple_documents(paths)
+    assert [c.page_content for c in result] == [c.page_content for c in serial] * 3
+
+def test_filter_chunks_by_length_ignores_edge_whitespace(processor):
+    chunks = [
+        Document(page_content="   padded   "),
+        Document(page_content="  inner words count  "),
+    ]
+    filtered = processor.filter_chunks_by_length(chunks, min_length=10)
+    assert [c.page_content for c in filtered] == ["  inner words count  "]
+
+def test_deduplicate_chunks(processor):
+    chunks = [
+        Document(page_content="shared disclaimer", metadata={"source": "a.pdf"}),
+        Document(page_content="unique text", metadata={"source": "a.pdf"}),
+        Document(page_content="shared disclaimer", metadata={"source": "b.pdf"}),
+    ]
+    unique = processor.deduplicate_chunks(chunks)
+    assert [c.page_content for c in unique] == ["shared disclaimer", "unique text"]
+    assert unique[0].metadata["source"] == "a.pdf"
+    assert unique[0].metadata["sources"] == ["a.pdf", "b.pdf"]
+
+def test_stats_and_filter_use_chunk_size_metadata(processor):
+    chunks = processor.process_document(os.path.abspath("tests/data/test.txt"))
+    assert all(c.metadata["chunk_size"] == len(c.page_content) for c in chunks)
+
+    stats = processor.get_document_stats(chunks)
+    assert stats["total_characters"] == sum(len(c.page_content) for c in chunks)
+
+    filtered = processor.filter_chunks_by_length(chunks, min_length=30)
+    assert filtered == [c for c in chunks if len(c.page_content.strip()) >= 30]
+
+def test_filter_ignores_stale_chunk_size(processor):
+    chunks = [
+        Document(page_content="short", metadata={"chunk_size": 500}),
+        Document(page_content="long enough to keep", metadata={"chunk_size": 2}),
+    ]
+    filtered = processor.filter_chunks_by_length(chunks, min_length=10)
+    assert [c.page_content for c in filtered] == ["long enough to keep"]
+
+
+def test_separator_ends_match_regex():
+    from src.components.data_processor import _separator_ends
+
+    text = "Para one.\n\nLine\nword  end\n\n\nlast 😀 é\n"
+    expected = [m.end() for m in re.finditer(r"\n\n|\n| ", text)]
+    assert _separator_ends(text).tolist() == expected
+    assert _separator_ends("").tolist() == []
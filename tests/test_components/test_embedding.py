@@ -5,6 +5,7 @@ from src.components.embedding import EmbeddingModel
 @patch("src.components.embedding.CohereEmbeddings")
 def test_initialization(mock_cohere, mock_settings):
     mock_settings.return_value.embedding_model_name = "embed-model"
+    mock_settings.return_value.embedding_type = "int8"
     mock_settings.return_value.cohere_api_key = "fake-api-key"
 
     mock_embed_instance = MagicMock()
@@ -15,7 +16,8 @@ def test_initialization(mock_cohere, mock_settings):
     mock_settings.assert_called_once()
     mock_cohere.assert_called_once_with(
         cohere_api_key="fake-api-key",
-        model="embed-model"
+        model="embed-model",
+        embedding_types=["int8"]
     )
     assert model.get() == mock_embed_instance
 
@@ -34,3 +36,63 @@ def test_embed_query(mock_cohere, mock_settings):
 
     mock_embed_instance.embed_query.assert_called_once_with("hello world")
     assert result == [0.1, 0.2, 0.3]
+
+@patch("src.components.embedding.get_settings")
+@patch("src.components.embedding.CohereEmbeddings")
+def test_embed_query_is_cached(mock_cohere, mock_settings):
+    mock_settings.return_value.embedding_model_name = "embed-model"
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+
+    mock_embed_instance = MagicMock()
+    mock_embed_instance.embed_query.side_effect = lambda text: [float(len(text))]
+    mock_cohere.return_value = mock_embed_instance
+
+    model = EmbeddingModel(cache_size=1)
+    assert model.embed_query("flu") == [3.0]
+    assert model.embed_query("flu") == [3.0]
+    assert mock_embed_instance.embed_query.call_count == 1
+
+    model.embed_query("fever")  # evicts "flu"
+    model.embed_query("flu")
+    assert mock_embed_instance.embed_query.call_count == 3
+
+@patch("src.components.embedding.get_settings")
+@patch("src.components.embedding.CohereEmbeddings")
+def test_embed_queries_batches_uncached(mock_cohere, mock_settings):
+    mock_settings.return_value.embedding_model_name = "embed-model"
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+
+    mock_embed_instance = MagicMock()
+    mock_embed_instance.embed_query.side_effect = lambda text: [float(len(text))]
+    mock_embed_instance.embed.side_effect = lambda texts, input_type: [[float(len(t))] for t in texts]
+    mock_cohere.return_value = mock_embed_instance
+
+    model = EmbeddingModel()
+    model.embed_query("flu")
+    result = model.embed_queries(["flu", "fever", "fever", "cough!"])
+
+    assert result == [[3.0], [5.0], [5.0], [6.0]]
+    mock_embed_instance.embed.assert_called_once_with(["fever", "cough!"], input_type="search_query")
+
+
+@patch("src.components.embedding.get_settings")
+@patch("src.components.embedding.CohereEmbeddings")
+def test_dim_known_model_needs_no_call(mock_cohere, mock_settings):
+    mock_settings.return_value.embedding_model_name = "embed-english-light-v3.0"
+    model = EmbeddingModel()
+
+    assert model.dim() == 384
+    mock_cohere.return_value.embed_query.assert_not_called()
+
+
+@patch("src.components.embedding.get_settings")
+@patch("src.components.embedding.CohereEmbeddings")
+def test_dim_learned_from_embeddings(mock_cohere, mock_settings):
+    mock_settings.return_value.embedding_model_name = "custom-model"
+    mock_cohere.return_value.embed_documents.return_value = [[0.0] * 8, [1.0] * 8]
+    mock_cohere.return_value.embed_query.return_value = [0.0] * 8
+    model = EmbeddingModel()
+
+    model.embed_documents(["a", "b"])
+    assert model.dim() == 8
+    mock_cohere.return_value.embed_query.assert_not_called()
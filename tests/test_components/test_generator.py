@@ -1,5 +1,7 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.messages import HumanMessage, SystemMessage
 from src.components.generator import Generator
 
 @pytest.fixture
@@ -32,9 +34,7 @@ def test_initialization(mock_get_settings, mock_chat_cohere, mock_prompt_templat
 @patch("src.components.generator.get_settings")
 def test_generate(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_settings):
     mock_get_settings.return_value = mock_settings
-    mock_prompt = MagicMock()
-    mock_prompt.format.return_value = "formatted prompt"
-    mock_prompt_template.from_messages.return_value = mock_prompt
+    mock_prompt_template.from_messages.return_value = MagicMock()
 
     mock_llm = MagicMock()
     mock_llm.invoke.return_value.content = " Final answer "
@@ -43,7 +43,10 @@ def test_generate(mock_get_settings, mock_chat_cohere, mock_prompt_template, moc
     generator = Generator()
     result = generator.generate("What is a migraine?", "Context about migraines")
     
-    mock_llm.invoke.assert_called_once_with("formatted prompt")
+    messages = mock_llm.invoke.call_args.args[0]
+    assert isinstance(messages[0], SystemMessage)
+    assert isinstance(messages[1], HumanMessage)
+    assert messages[1].content == "Context: Context about migraines\n\nQuestion: What is a migraine?\n\nAnswer:"
     assert result == "Final answer"
 
 @patch("src.components.generator.ChatPromptTemplate")
@@ -51,9 +54,7 @@ def test_generate(mock_get_settings, mock_chat_cohere, mock_prompt_template, moc
 @patch("src.components.generator.get_settings")
 def test_stream(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_settings):
     mock_get_settings.return_value = mock_settings
-    mock_prompt = MagicMock()
-    mock_prompt.format.return_value = "formatted prompt"
-    mock_prompt_template.from_messages.return_value = mock_prompt
+    mock_prompt_template.from_messages.return_value = MagicMock()
 
     mock_streaming_llm = MagicMock()
     mock_streaming_llm.stream.return_value = [
@@ -67,7 +68,28 @@ def test_stream(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_
     chunks = list(generator.stream("What is flu?", "Flu info"))
     
     assert chunks == ["Part1", "Part2"]
-    mock_streaming_llm.stream.assert_called_once_with("formatted prompt")
+    mock_streaming_llm.stream.assert_called_once_with(generator._build_messages("What is flu?", "Flu info"))
+
+@patch("src.components.generator.ChatPromptTemplate")
+@patch("src.components.generator.ChatCohere")
+@patch("src.components.generator.get_settings")
+def test_streaming_client_reused(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    mock_prompt_template.from_messages.return_value = MagicMock()
+    mock_streaming_llm = MagicMock()
+    mock_streaming_llm.stream.side_effect = lambda messages: [MagicMock(content="Part")]
+    mock_chat_cohere.side_effect = [MagicMock(), mock_streaming_llm, MagicMock(), MagicMock()]
+
+    generator = Generator()
+    list(generator.stream("What is flu?", "Flu info"))
+    list(generator.stream("What is a cold?", "Cold info"))
+
+    assert mock_chat_cohere.call_count == 2  # init + a single streaming client
+    assert mock_streaming_llm.stream.call_count == 2
+
+    generator.update(temperature=0.2)
+    list(generator.stream("What is flu?", "Flu info"))
+    assert mock_chat_cohere.call_count == 4  # update rebuilt both clients
 
 @patch("src.components.generator.ChatPromptTemplate")
 @patch("src.components.generator.ChatCohere")
@@ -102,3 +124,45 @@ def test_get_config(mock_get_settings, mock_chat_cohere, mock_prompt_template, m
     assert config["temperature"] == 0.7
     assert config["max_tokens"] == 256
     assert config["prompt_template"] == "PromptTemplate"
+
+@patch("src.components.generator.ChatPromptTemplate")
+@patch("src.components.generator.ChatCohere")
+@patch("src.components.generator.get_settings")
+def test_agenerate(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    mock_prompt_template.from_messages.return_value = MagicMock()
+
+    mock_llm = MagicMock()
+    mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content=" Async answer "))
+    mock_chat_cohere.return_value = mock_llm
+
+    generator = Generator()
+    result = asyncio.run(generator.agenerate("What is a migraine?", "Context about migraines"))
+
+    mock_llm.ainvoke.assert_awaited_once_with(generator._build_messages("What is a migraine?", "Context about migraines"))
+    assert result == "Async answer"
+
+@patch("src.components.generator.ChatPromptTemplate")
+@patch("src.components.generator.ChatCohere")
+@patch("src.components.generator.get_settings")
+def test_temperature_override_reuses_clients(mock_get_settings, mock_chat_cohere, mock_prompt_template, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    mock_prompt_template.from_messages.return_value = MagicMock()
+    mock_chat_cohere.side_effect = lambda **kwargs: MagicMock(**{"invoke.return_value.content": str(kwargs["temperature"])})
+
+    generator = Generator()
+    answers = [generator.generate("q", "c", temperature=t) for t in (0.2, 0.7, 0.2, None)]
+
+    assert answers == ["0.2", "0.7", "0.2", "0.7"]
+    assert mock_chat_cohere.call_count == 2  # default client + one for 0.2
+    assert generator.temperature == 0.7
+
+@patch("src.components.generator.ChatCohere")
+@patch("src.components.generator.get_settings")
+def test_build_messages_match_prompt_template(mock_get_settings, mock_chat_cohere, mock_settings):
+    mock_get_settings.return_value = mock_settings
+
+    generator = Generator()
+    messages = generator._build_messages("What is flu?", "Flu info")
+
+    assert messages == generator.prompt.format_messages(context="Flu info", question="What is flu?")
@@ -0,0 +1,88 @@
+from unittest.mock import patch, MagicMock
+from langchain_core.documents import Document
+from src.components.reranker import Reranker
+
+
+def _docs():
+    return [
+        (Document(page_content="Flu is a viral infection", metadata={"source": "a", "chunk_id": 0}), 0.5),
+        (Document(page_content="Headache is a symptom", metadata={"source": "a", "chunk_id": 1}), 0.6),
+        (Document(page_content="Cold overlaps with flu", metadata={"source": "b", "chunk_id": 0}), 0.7),
+    ]
+
+
+@patch("src.components.reranker.get_settings")
+@patch("src.components.reranker.CohereRerank")
+def test_rerank_orders_by_relevance(mock_rerank, mock_settings):
+    mock_settings.return_value.rerank_model = "rerank-model"
+    mock_settings.return_value.rerank_cache_ttl = 900
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+    mock_rerank.return_value.rerank.return_value = [
+        {"index": 2, "relevance_score": 0.9},
+        {"index": 0, "relevance_score": 0.8},
+        {"index": 1, "relevance_score": 0.1},
+    ]
+
+    reranker = Reranker()
+    results = reranker.rerank("What is flu?", _docs(), top_n=2)
+
+    assert [doc.metadata["source"] for doc, _ in results] == ["b", "a"]
+    assert [score for _, score in results] == [0.9, 0.8]
+
+
+@patch("src.components.reranker.get_settings")
+@patch("src.components.reranker.CohereRerank")
+def test_rerank_caches_scores(mock_rerank, mock_settings):
+    mock_settings.return_value.rerank_model = "rerank-model"
+    mock_settings.return_value.rerank_cache_ttl = 900
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+    mock_rerank.return_value.rerank.return_value = [
+        {"index": 0, "relevance_score": 0.3},
+        {"index": 1, "relevance_score": 0.2},
+        {"index": 2, "relevance_score": 0.1},
+    ]
+
+    reranker = Reranker()
+    first = reranker.rerank("What is flu?", _docs(), top_n=3)
+    second = reranker.rerank("What is flu?", _docs(), top_n=3)
+
+    assert mock_rerank.return_value.rerank.call_count == 1
+    assert [s for _, s in first] == [s for _, s in second]
+
+
+@patch("src.components.reranker.get_settings")
+@patch("src.components.reranker.CohereRerank")
+def test_rerank_cache_is_bounded(mock_rerank, mock_settings):
+    mock_settings.return_value.rerank_model = "rerank-model"
+    mock_settings.return_value.rerank_cache_ttl = 900
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+    mock_rerank.return_value.rerank.side_effect = lambda texts, query, top_n: [
+        {"index": i, "relevance_score": 0.5} for i in range(len(texts))
+    ]
+
+    reranker = Reranker(cache_size=4)
+    reranker.rerank("What is flu?", _docs(), top_n=3)
+    reranker.rerank("What is a cold?", _docs(), top_n=3)
+
+    assert len(reranker._cache) == 4
+    # The first query's two oldest scores were evicted; only those are rescored
+    reranker.rerank("What is flu?", _docs(), top_n=3)
+    assert len(mock_rerank.return_value.rerank.call_args.args[0]) == 2
+
+
+@patch("src.components.reranker.get_settings")
+@patch("src.components.reranker.CohereRerank")
+def test_rerank_rescores_changed_content(mock_rerank, mock_settings):
+    mock_settings.return_value.rerank_model = "rerank-model"
+    mock_settings.return_value.rerank_cache_ttl = 900
+    mock_settings.return_value.cohere_api_key = "fake-api-key"
+    mock_rerank.return_value.rerank.side_effect = lambda texts, query, top_n: [
+        {"index": i, "relevance_score": 0.5} for i in range(len(texts))
+    ]
+
+    reranker = Reranker()
+    reranker.rerank("What is flu?", _docs(), top_n=3)
+    edited = [(Document(page_content="Flu is caused by influenza", metadata={"source": "a", "chunk_id": 0}), 0.5)]
+    reranker.rerank("What is flu?", edited + _docs()[1:], top_n=3)
+
+    assert mock_rerank.return_value.rerank.call_args.args[0] == ["Flu is caused by influenza"]
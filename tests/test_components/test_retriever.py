@@ -24,27 +24,53 @@ def mock_store():
 
 @patch("src.components.retriever.EmbeddingModel")
 def test_similarity_search(mock_embedding_model, mock_store, mock_docs):
-    mock_store.get_vector_store().similarity_search_with_score.return_value = mock_docs
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = mock_docs
     retriever = Retriever(store_manager=mock_store)
 
     results = retriever.similarity_search("What is flu?", k=2)
 
     assert len(results) == 3
-    mock_store.get_vector_store().similarity_search_with_score.assert_called_once()
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.assert_called_once()
+
+
+@patch("src.components.retriever.EmbeddingModel")
+def test_similarity_search_with_threshold_uses_range_search(mock_embedding_model, mock_store, mock_docs):
+    mock_embedding_model.return_value.embed_query.return_value = [0.1, 0.2]
+    mock_store.similarity_search_range.return_value = mock_docs[::-1]
+    retriever = Retriever(store_manager=mock_store)
+
+    results = retriever.similarity_search_with_threshold("What is flu?", k=2, threshold=0.45)
+
+    assert results == mock_docs[::-1][:2]
+    mock_store.similarity_search_range.assert_called_once_with([0.1, 0.2], 0.45)
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.assert_not_called()
 
 
 @patch("src.components.retriever.EmbeddingModel")
 def test_similarity_search_with_threshold(mock_embedding_model, mock_store, mock_docs):
-    mock_store.get_vector_store().similarity_search_with_score.return_value = mock_docs
+    mock_store.scores_are_similarities = False
+    mock_store.similarity_search_range.side_effect = RuntimeError("range search not implemented")
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = mock_docs
     retriever = Retriever(store_manager=mock_store)
 
     results = retriever.similarity_search_with_threshold("What is flu?", k=2, threshold=0.65)
     assert len(results) == 2  # only the first two are <= 0.65
 
 
+@patch("src.components.retriever.EmbeddingModel")
+def test_similarity_search_with_threshold_cosine(mock_embedding_model, mock_store, mock_docs):
+    mock_store.scores_are_similarities = True
+    mock_store.similarity_search_range.side_effect = RuntimeError("range search not implemented")
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = mock_docs
+    retriever = Retriever(store_manager=mock_store)
+
+    results = retriever.similarity_search_with_threshold("What is flu?", k=2, threshold=0.65)
+    assert [score for _, score in results] == [0.8]  # similarities keep scores >= 0.65
+
+
 @patch("src.components.retriever.EmbeddingModel")
 def test_get_relevant_context(mock_embedding_model, mock_store, mock_docs):
-    mock_store.get_vector_store().similarity_search_with_score.return_value = mock_docs
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = mock_docs
     retriever = Retriever(store_manager=mock_store)
 
     context = retriever.get_relevant_context("flu symptoms", k=3, max_context_length=200)
@@ -56,6 +82,7 @@ def test_get_relevant_context(mock_embedding_model, mock_store, mock_docs):
 def test_calculate_similarity_threshold(mock_embedding_model):
     mock_embed = MagicMock()
     mock_embed.embed_query.side_effect = lambda text: np.array([1.0 if "query" in text else 0.5] * 5)
+    mock_embed.embed_documents.side_effect = lambda texts: [[0.5, 0.5, 0.5, 0.5, float(i)] for i, _ in enumerate(texts)]
     mock_embedding_model.return_value = mock_embed
 
     retriever = Retriever(store_manager=MagicMock())
@@ -66,6 +93,8 @@ def test_calculate_similarity_threshold(mock_embedding_model):
     )
 
     assert 0 <= threshold <= 1
+    mock_embed.embed_documents.assert_called_once_with(["doc1", "doc2", "doc3"])
+    mock_embed.embed_query.assert_called_once_with("query sample")
 
 
 @patch("src.components.retriever.EmbeddingModel")
@@ -74,3 +103,86 @@ def test_calculate_similarity_threshold_empty(mock_embedding_model):
     retriever = Retriever(store_manager=MagicMock())
     threshold = retriever.calculate_similarity_threshold("query", [])
     assert threshold == 0.7  # fallback value
+
+
+def test_batched_cosine_matches_numpy():
+    from src.utils.simkernels import _batched_cosine_numpy, batched_cosine
+
+    rng = np.random.default_rng(0)
+    docs = rng.random((7, 32), dtype=np.float32)
+    query = rng.random(32, dtype=np.float32)
+    assert np.allclose(batched_cosine(docs, query), _batched_cosine_numpy(docs, query), atol=1e-5)
+
+
+def test_simsimd_cosine_matches_numpy():
+    pytest.importorskip("simsimd")
+    from src.utils.simkernels import _batched_cosine_numpy, _batched_cosine_simsimd
+
+    rng = np.random.default_rng(0)
+    docs = rng.random((7, 32), dtype=np.float32)
+    query = rng.random(32, dtype=np.float32)
+    assert np.allclose(_batched_cosine_simsimd(docs, query), _batched_cosine_numpy(docs, query), atol=1e-5)
+
+
+@patch("src.components.retriever.EmbeddingModel")
+def test_get_relevant_context_truncates_last_block(mock_embedding_model, mock_store):
+    docs = [
+        (Document(page_content="a" * 50, metadata={"source": "one.txt"}), 0.1),
+        (Document(page_content="b" * 300, metadata={"source": "two.txt"}), 0.2),
+        (Document(page_content="c" * 50, metadata={"source": "three.txt"}), 0.3),
+    ]
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = docs
+    retriever = Retriever(store_manager=mock_store)
+
+    context = retriever.get_relevant_context("query", k=3, max_context_length=250)
+
+    first = "[Source: one.txt]\n" + "a" * 50 + "\n"
+    assert context.startswith(first + "\n[Source: two.txt]\nbbb")
+    assert context.endswith("...")
+    assert "three.txt" not in context
+    assert len(context) == 250 + 1  # the budget, plus the newline joining the two blocks
+
+
+@patch("src.components.retriever.EmbeddingModel")
+def test_rank_listing_skipped_when_debug_disabled(mock_embedding_model, mock_store, mock_docs):
+    doc = MagicMock()
+    mock_store.get_vector_store().similarity_search_with_score_by_vector.return_value = [(doc, 0.1)]
+    retriever = Retriever(store_manager=mock_store)
+
+    retriever.similarity_search_by_vector([0.1, 0.2], k=1)
+    doc.metadata.get.assert_not_called()
+
+
+def test_rank_listing_format():
+    from src.components.retriever import _rank_listing
+
+    docs = [
+        (Document(page_content="a", metadata={"source": "a.pdf", "chunk_id": 4}), 0.12345),
+        (Document(page_content="b", metadata={}), 1.0),
+    ]
+    assert _rank_listing(docs) == (
+        "  - Rank 1: a.pdf [Chunk: 4] (Score: 0.1235)\n"
+        "  - Rank 2: Unknown [Chunk: N/A] (Score: 1.0000)"
+    )
+
+
+def test_is_enabled_tracks_configured_level():
+    from src.utils.logger import is_enabled
+
+    assert is_enabled("INFO")
+    assert is_enabled("ERROR")
+    assert not is_enabled("DEBUG")
+
+
+@patch("src.components.retriever.EmbeddingModel")
+def test_similarity_search_batch(mock_embedding_model, mock_store, mock_docs):
+    mock_embedding_model.return_value.embed_queries.return_value = [[0.1], [0.2]]
+    mock_store.similarity_search_batch.return_value = [mock_docs[:1], mock_docs[1:]]
+    retriever = Retriever(store_manager=mock_store)
+
+    results = retriever.similarity_search_batch(["What is flu?", "What is a cold?"], k=2)
+
+    assert results == [mock_docs[:1], mock_docs[1:]]
+    mock_embedding_model.return_value.embed_queries.assert_called_once_with(["What is flu?", "What is a cold?"])
+    mock_store.similarity_search_batch.assert_called_once_with([[0.1], [0.2]], k=2)
+    mock_embedding_model.return_value.embed_query.assert_not_called()
@@ -0,0 +1,54 @@
+import numpy as np
+from src.components.semantic_cache import SemanticCache
+
+
+def test_near_duplicate_query_hits():
+    cache = SemanticCache(threshold=0.95)
+    vec = np.linspace(0.1, 1.0, 64)
+    cache.put("ns", vec, {"answer": "cached"})
+
+    assert cache.get("ns", vec * 2.0) == {"answer": "cached"}
+    assert cache.get("other", vec) is None
+
+
+def test_dissimilar_query_misses():
+    cache = SemanticCache(threshold=0.95)
+    vec = np.linspace(0.1, 1.0, 64)
+    cache.put("ns", vec, "cached")
+
+    assert cache.get("ns", -vec) is None
+
+
+def test_expired_entries_are_dropped():
+    cache = SemanticCache(ttl=0)
+    vec = np.ones(8)
+    cache.put("ns", vec, "cached")
+
+    assert cache.get("ns", vec) is None
+
+
+def test_namespace_keeps_newest_entries():
+    cache = SemanticCache(threshold=0.999, max_entries=2)
+    base = np.ones(8)
+    vecs = [base + np.eye(8)[i] * 0.01 for i in range(3)]
+    for i, vec in enumerate(vecs):
+        cache.put("ns", vec, i)
+
+    assert [value for _, value, _ in cache._entries["ns"]] == [1, 2]
+
+
+def test_every_query_above_threshold_hits():
+    cache = SemanticCache(threshold=0.95)
+    rng = np.random.default_rng(0)
+    hits = 0
+    for i in range(50):
+        u = rng.standard_normal(1024)
+        u /= np.linalg.norm(u)
+        w = rng.standard_normal(1024)
+        w -= (w @ u) * u
+        w /= np.linalg.norm(w)
+        cache.put(i, u, "cached")
+        # Cosine 0.96 to the cached query, on a random side of any hyperplane
+        hits += cache.get(i, 0.96 * u + np.sqrt(1 - 0.96 ** 2) * w) == "cached"
+
+    assert hits == 50
@@ -1,3 +1,5 @@
+import faiss
+import numpy as np
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 from src.components.vector_store import VectorStore
@@ -13,6 +15,7 @@ def dummy_docs():
 def mock_embeddings():
     mock = MagicMock()
     mock.embed_query.return_value = [0.1] * 384  # example dim
+    mock.embed_documents.side_effect = lambda texts: [[float(i)] * 384 for i, _ in enumerate(texts)]
     return mock
 
 
@@ -21,13 +24,16 @@ def mock_embeddings():
 @patch("src.components.vector_store.get_settings")
 def test_create_vector_store(mock_get_settings, MockEmbeddingModel, MockFAISS, dummy_docs, mock_embeddings):
     MockEmbeddingModel.return_value.get.return_value = mock_embeddings
-    MockFAISS.from_documents.return_value = MagicMock()
+    MockFAISS.return_value = MagicMock()
 
     store = VectorStore()
     store.create(dummy_docs)
 
     assert store.get_document_count() == 2
-    MockFAISS.from_documents.assert_called_once()
+    MockFAISS.assert_called_once()
+    index = MockFAISS.call_args.kwargs["index"]
+    assert isinstance(index, faiss.IndexHNSWFlat)
+    assert index.ntotal == 2
 
 
 @patch("src.components.vector_store.FAISS")
@@ -36,44 +42,67 @@ def test_create_vector_store(mock_get_settings, MockEmbeddingModel, MockFAISS, d
 def test_add_documents(mock_get_settings, MockEmbeddingModel, MockFAISS, dummy_docs, mock_embeddings):
     MockEmbeddingModel.return_value.get.return_value = mock_embeddings
     mock_store = MagicMock()
-    MockFAISS.from_documents.return_value = mock_store
+    MockFAISS.return_value = mock_store
 
     store = VectorStore()
     store.create([Document(page_content="Base")])
     store.add_documents(dummy_docs)
 
     assert store.get_document_count() == 3
-    mock_store.add_documents.assert_called_once()
+    mock_store.add_embeddings.assert_called_once()
+    mock_store.add_documents.assert_not_called()
+    assert mock_embeddings.embed_documents.call_args.args[0] == ["Doc 1", "Doc 2"]
 
 
-@patch("src.components.vector_store.open", new_callable=mock_open)
 @patch("src.components.vector_store.pickle.dump")
 @patch("src.components.vector_store.FAISS")
 @patch("src.components.vector_store.EmbeddingModel")
 @patch("src.components.vector_store.get_settings")
-def test_save(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_pickle, mock_file, dummy_docs, mock_embeddings):
+def test_save(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_pickle, dummy_docs, mock_embeddings, tmp_path):
     MockEmbeddingModel.return_value.get.return_value = mock_embeddings
     mock_store = MagicMock()
-    MockFAISS.from_documents.return_value = mock_store
+    MockFAISS.return_value = mock_store
 
-    store = VectorStore()
+    store = VectorStore(store_path=str(tmp_path))
     store.create(dummy_docs)
-    store.save()
+    store.save(str(tmp_path))
 
     mock_store.save_local.assert_called()
-    mock_pickle.assert_called_once()
+    mock_pickle.assert_not_called()
+    assert (tmp_path / "documents" / "content.npy").exists()
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_documents_round_trip_columnar(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    docs = [
+        Document(page_content="Fièvre et toux", metadata={"source": "a.pdf", "chunk_id": 0, "page": 3}),
+        Document(page_content="", metadata={"source": "b.txt", "chunk_id": 0}),
+    ]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(docs)
+    store.save(str(tmp_path))
+
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load(str(tmp_path))
+
+    assert loaded.get_document_count() == 2
+    assert isinstance(loaded.get_documents()._columns["content"], np.memmap)
+    assert loaded.get_documents()[1] == docs[1]
+    assert loaded.get_documents()._docs[0] is None  # reading b.txt did not build a.pdf's Document
+    assert loaded.get_documents()[0] == docs[0]
 
 
 @patch("src.components.vector_store.open", new_callable=mock_open)
 @patch("src.components.vector_store.pickle.load")
+@patch("src.components.vector_store.faiss.read_index")
 @patch("src.components.vector_store.FAISS")
 @patch("src.components.vector_store.EmbeddingModel")
 @patch("src.components.vector_store.get_settings")
-def test_load(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_pickle, mock_file, dummy_docs, mock_embeddings, tmp_path):
+def test_load(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_read_index, mock_pickle, mock_file, dummy_docs, mock_embeddings, tmp_path):
     MockEmbeddingModel.return_value.get.return_value = mock_embeddings
-    mock_store = MagicMock()
-    MockFAISS.load_local.return_value = mock_store
-    mock_pickle.return_value = dummy_docs
+    mock_pickle.side_effect = [(MagicMock(), {}), dummy_docs]
 
     store = VectorStore(store_path=str(tmp_path))
     index_path = tmp_path / "faiss_index"
@@ -83,7 +112,8 @@ def test_load(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_pickle, moc
 
     store.load()
     assert store.get_document_count() == 2
-    MockFAISS.load_local.assert_called_once()
+    mock_read_index.assert_called_once_with(str(index_path / "index.faiss"), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    MockFAISS.assert_called_once()
 
 
 @patch("src.components.vector_store.shutil.rmtree")
@@ -101,9 +131,261 @@ def test_delete(mock_get_settings, MockEmbeddingModel, mock_rmtree, tmp_path):
 
 @patch("src.components.vector_store.EmbeddingModel")
 @patch("src.components.vector_store.get_settings")
-def test_get_embedding_dim_with_query(mock_get_settings, MockEmbeddingModel, mock_embeddings):
-    mock_embeddings.embed_query.return_value = [0.0] * 512
+def test_get_embedding_dim_without_store(mock_get_settings, MockEmbeddingModel, mock_embeddings):
     MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    MockEmbeddingModel.return_value.dim.return_value = 512
     store = VectorStore()
     dim = store.get_embedding_dim()
     assert dim == 512
+    mock_embeddings.embed_query.assert_not_called()
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_vectors_persisted_and_memory_mapped(mock_get_settings, MockEmbeddingModel, dummy_docs, mock_embeddings, tmp_path):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(dummy_docs)
+    store.save(str(tmp_path))
+
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load(str(tmp_path))
+
+    vectors = loaded.get_vectors()
+    assert isinstance(vectors, np.memmap)
+    assert vectors.shape == (2, 384)
+    assert np.isclose(np.linalg.norm(vectors[1]), 1.0)
+    mock_embeddings.embed_documents.assert_called_once()
+
+
+@patch("src.components.vector_store.FAISS")
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_create_embeds_duplicate_content_once(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_embeddings):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    docs = [
+        Document(page_content="Disclaimer", metadata={"source": "a.pdf"}),
+        Document(page_content="Body", metadata={"source": "a.pdf"}),
+        Document(page_content="Disclaimer", metadata={"source": "b.pdf"}),
+    ]
+    store = VectorStore()
+    store.create(docs)
+
+    mock_embeddings.embed_documents.assert_called_once_with(["Disclaimer", "Body"])
+    assert store.get_vectors().shape == (3, 384)
+    assert (store.get_vectors()[2] == store.get_vectors()[0]).all()
+    assert MockFAISS.call_args.kwargs["index"].ntotal == 3
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_embed_unique_without_duplicates_is_not_copied(mock_get_settings, MockEmbeddingModel, mock_embeddings):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    embedded = np.ones((2, 384), dtype=np.float32)
+    mock_embeddings.embed_documents.side_effect = None
+    mock_embeddings.embed_documents.return_value = embedded
+    store = VectorStore()
+
+    assert store._embed_unique(["Doc 1", "Doc 2"]) is embedded
+
+
+@patch("src.components.vector_store.FAISS")
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_create_with_scalar_quantization(mock_get_settings, MockEmbeddingModel, MockFAISS, dummy_docs, mock_embeddings):
+    mock_get_settings.return_value.faiss_quantization = "int8"
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+
+    store = VectorStore()
+    store.create(dummy_docs)
+
+    index = MockFAISS.call_args.kwargs["index"]
+    assert isinstance(index, faiss.IndexHNSWSQ)
+    assert index.is_trained
+    assert index.ntotal == 2
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_similarity_search_batch(mock_get_settings, MockEmbeddingModel, mock_embeddings):
+    mock_get_settings.return_value.faiss_quantization = "none"
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    basis = np.eye(3, 384, dtype=np.float32)
+    mock_embeddings.embed_documents.side_effect = lambda texts: basis[:len(texts)].tolist()
+    docs = [Document(page_content=f"Doc {i}") for i in range(3)]
+    store = VectorStore()
+    store.create(docs)
+
+    results = store.similarity_search_batch([(5 * basis[2]).tolist(), (basis[0] + 0.1 * basis[1]).tolist()], k=5)
+
+    assert [doc.page_content for doc, _ in results[0]][0] == "Doc 2"
+    assert [doc.page_content for doc, _ in results[1]][:2] == ["Doc 0", "Doc 1"]
+    assert all(len(r) == 3 for r in results)
+    assert np.isclose(results[0][0][1], 1.0)  # cosine similarity, not raw inner product
+    assert store.scores_are_similarities
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_search_scores_are_cosine_similarities(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    mock_get_settings.return_value.faiss_quantization = "none"
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    mock_embeddings.embed_documents.side_effect = lambda texts: [[3.0, 4.0] + [0.0] * 382, [0.0, 2.0] + [0.0] * 382][:len(texts)]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create([Document(page_content="a"), Document(page_content="b")])
+    store.save(str(tmp_path))
+
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load(str(tmp_path))
+    results = loaded.get_vector_store().similarity_search_with_score_by_vector([0.0, 10.0] + [0.0] * 382, k=2)
+
+    assert [doc.page_content for doc, _ in results] == ["b", "a"]
+    assert np.allclose([score for _, score in results], [1.0, 0.8])
+
+
+@patch("src.components.vector_store.IVFPQ_MIN_VECTORS", 1000)
+@patch("src.components.vector_store.FAISS")
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_create_large_corpus_uses_ivfpq(mock_get_settings, MockEmbeddingModel, MockFAISS, mock_embeddings):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    rng = np.random.default_rng(0)
+    mock_embeddings.embed_documents.side_effect = lambda texts: rng.standard_normal((len(texts), 96)).astype(np.float32)
+    docs = [Document(page_content=f"Doc {i}") for i in range(1000)]
+
+    store = VectorStore()
+    store.create(docs)
+
+    index = MockFAISS.call_args.kwargs["index"]
+    ivf = faiss.extract_index_ivf(index)
+    assert isinstance(index, faiss.IndexIVFPQ)
+    assert ivf.nlist == int(4 * np.sqrt(1000))
+    assert ivf.nprobe == 16
+    assert index.pq.M == 48  # largest divisor of 96 not above 64
+    assert index.ntotal == 1000
+    # Nearest neighbour of a stored vector is itself despite the PQ codes
+    _, ids = index.search(store.get_vectors()[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+
+
+@patch("src.components.vector_store.IVFPQ_MIN_VECTORS", 1000)
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_ivfpq_store_round_trip(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    rng = np.random.default_rng(0)
+    mock_embeddings.embed_documents.side_effect = lambda texts: rng.standard_normal((len(texts), 96)).astype(np.float32)
+    docs = [Document(page_content=f"Doc {i}") for i in range(1000)]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(docs)
+    store.save()
+
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load()
+
+    assert isinstance(loaded.get_vector_store().index, faiss.IndexIVFPQ)
+    assert loaded.get_document_count() == 1000
+    results = loaded.similarity_search_batch(store.get_vectors()[:5].tolist(), k=1)
+    assert [res[0][0].page_content for res in results] == [f"Doc {i}" for i in range(5)]
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_mapped_index_copied_before_writes(mock_get_settings, MockEmbeddingModel, dummy_docs, mock_embeddings, tmp_path):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(dummy_docs)
+    store.save()
+
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load()
+    assert loaded._mapped_index_path is not None
+    assert loaded.similarity_search_batch([[1.0] * 384], k=1)[0][0][0].page_content == "Doc 2"
+
+    loaded.save()  # same files the index, vectors and documents are mapped from
+    loaded.add_documents([Document(page_content="Doc 3")])
+    assert loaded._mapped_index_path is None
+    assert loaded.get_vector_store().index.ntotal == 3
+
+    reloaded = VectorStore(store_path=str(tmp_path))
+    reloaded.load()
+    assert [doc.page_content for doc in reloaded.get_documents()] == ["Doc 1", "Doc 2"]
+    assert np.array_equal(reloaded.get_vectors(), store.get_vectors())
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_mapped_documents_pickle_by_path(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    import pickle
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    docs = [Document(page_content="x" * 10_000, metadata={"source": f"{i}.txt"}) for i in range(20)]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(docs)
+    store.save()
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load()
+
+    payload = pickle.dumps(loaded.get_documents())
+    restored = pickle.loads(payload)
+
+    assert len(payload) < 1_000
+    assert isinstance(restored._columns["content"], np.memmap)
+    assert list(restored) == docs
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_similarity_search_range(mock_get_settings, MockEmbeddingModel, mock_embeddings):
+    mock_get_settings.return_value.faiss_quantization = "none"
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    vectors = [[1.0, 0.0], [0.8, 0.6], [0.0, 1.0], [0.6, 0.8]]
+    mock_embeddings.embed_documents.side_effect = lambda texts: [v + [0.0] * 382 for v in vectors[:len(texts)]]
+    store = VectorStore()
+    store.create([Document(page_content=f"Doc {i}") for i in range(4)])
+
+    results = store.similarity_search_range([2.0, 0.0] + [0.0] * 382, 0.5)
+
+    assert [doc.page_content for doc, _ in results] == ["Doc 0", "Doc 1", "Doc 3"]
+    assert np.allclose([score for _, score in results], [1.0, 0.8, 0.6])
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_add_documents_after_load_keeps_documents_lazy(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    docs = [Document(page_content=f"Doc {i}", metadata={"source": f"{i}.txt", "chunk_id": 0}) for i in range(3)]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create(docs)
+    store.save()
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load()
+    assert loaded.get_documents()[1] == docs[1]
+
+    extra = Document(page_content="Doc 3", metadata={"source": "3.txt", "chunk_id": 0})
+    loaded.add_documents([extra])
+
+    documents = loaded.get_documents()
+    assert documents._docs[0] is None and documents._docs[2] is None
+    assert documents[3] is extra
+    assert list(documents) == docs + [extra]
+
+
+@patch("src.components.vector_store.EmbeddingModel")
+@patch("src.components.vector_store.get_settings")
+def test_add_documents_keeps_saved_vectors_exact(mock_get_settings, MockEmbeddingModel, mock_embeddings, tmp_path):
+    mock_get_settings.return_value.faiss_quantization = "int8"
+    MockEmbeddingModel.return_value.get.return_value = mock_embeddings
+    rng = np.random.default_rng(0)
+    embedded = rng.standard_normal((5, 384)).astype(np.float32)
+    mock_embeddings.embed_documents.side_effect = [embedded[:3], embedded[3:]]
+    store = VectorStore(store_path=str(tmp_path))
+    store.create([Document(page_content=f"Doc {i}") for i in range(3)])
+    store.save()
+    loaded = VectorStore(store_path=str(tmp_path))
+    loaded.load()
+
+    loaded.add_documents([Document(page_content=f"Doc {i}") for i in range(3, 5)])
+    loaded.save()
+
+    expected = embedded / np.linalg.norm(embedded, axis=1, keepdims=True)
+    assert np.allclose(np.load(tmp_path / "faiss_index" / "vectors.npy"), expected, atol=1e-6)
@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from langchain_core.documents import Document
 from src.core.rag_pipeline import RAGPipeline  
 from config.settings import get_settings
@@ -11,6 +12,8 @@ def mock_settings():
     mock = MagicMock()
     mock.temperature = 0.7
     mock.retrieval_k = 3
+    mock.semantic_cache_enabled = False
+    mock.max_concurrent_llm = 4
     return mock
 
 
@@ -33,6 +36,7 @@ def mock_generator():
     with patch('src.core.rag_pipeline.Generator') as MockGen:
         instance = MockGen.return_value
         instance.generate.return_value = "This is a generated answer."
+        instance.agenerate = AsyncMock(return_value="This is a generated answer.")
         instance.stream.return_value = iter(["This", " is", " streamed."])
         instance.model_name = "mock-model"
         instance.temperature = 0.7
@@ -98,6 +102,18 @@ def test_evaluate_response_quality(mock_get_settings, mock_generator, mock_retri
     assert metrics["cites_sources"]
     assert "quality_score" in metrics
 
+@patch('src.core.rag_pipeline.get_settings')
+def test_evaluate_response_quality_negative(mock_get_settings, mock_generator, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    pipeline = RAGPipeline()
+
+    doc = Document(page_content="Diabetes is a chronic condition.", metadata={"source": "medical.txt"})
+    metrics = pipeline.evaluate_response_quality("What is diabetes?", "It is chronic.", [(doc, 0.9), (doc, 0.8)])
+
+    assert not metrics["contains_disclaimer"]
+    assert not metrics["cites_sources"]
+    assert metrics["num_sources_used"] == 2
+
 @patch('src.core.rag_pipeline.get_settings')
 def test_get_pipeline_info(mock_get_settings, mock_generator, mock_settings):
     mock_get_settings.return_value = mock_settings
@@ -105,3 +121,111 @@ def test_get_pipeline_info(mock_get_settings, mock_generator, mock_settings):
     info = pipeline.get_pipeline_info()
     assert info["status"] == "ready"
     assert "model" in info
+
+
+@patch('src.core.rag_pipeline.Reranker')
+@patch('src.core.rag_pipeline.get_settings')
+def test_generate_response_with_rerank(mock_get_settings, MockReranker, mock_generator, mock_retriever, mock_vectorstore, mock_settings):
+    mock_settings.rerank_candidates = 30
+    mock_get_settings.return_value = mock_settings
+    doc = Document(page_content="Reranked document.", metadata={"source": "rerank.txt"})
+    MockReranker.return_value.rerank.return_value = [(doc, 0.95)]
+
+    pipeline = RAGPipeline()
+    result = pipeline.generate_response("What is COVID-19?", vectorstore=mock_vectorstore, rerank=True)
+
+    mock_retriever.similarity_search.assert_called_once_with("What is COVID-19?", k=30)
+    MockReranker.return_value.rerank.assert_called_once()
+    assert result["sources"] == [(doc, 0.95)]
+    assert result["metadata"]["reranked"] is True
+
+
+@patch('src.core.rag_pipeline.Retriever')
+@patch('src.core.rag_pipeline.get_settings')
+def test_retriever_reused_across_queries(mock_get_settings, MockRetriever, mock_generator, mock_vectorstore, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    doc = Document(page_content="This is a test document.", metadata={"source": "test.txt"})
+    MockRetriever.return_value.similarity_search_batch_by_vector.return_value = [[(doc, 0.9)]] * 3
+    MockRetriever.return_value.embeddings.embed_queries.return_value = [[1.0], [2.0], [3.0]]
+    MockRetriever.return_value.store = mock_vectorstore
+
+    pipeline = RAGPipeline()
+    results = pipeline.batch_generate_responses(["q1", "q2", "q3"], mock_vectorstore, k=2)
+
+    assert MockRetriever.call_count == 1
+    assert [r["answer"] for r in results] == ["This is a generated answer."] * 3
+    MockRetriever.return_value.embeddings.embed_queries.assert_called_once_with(["q1", "q2", "q3"])
+    MockRetriever.return_value.similarity_search_batch_by_vector.assert_called_once_with([[1.0], [2.0], [3.0]], 2)
+    MockRetriever.return_value.similarity_search_by_vector.assert_not_called()
+
+
+@patch('src.core.rag_pipeline.get_settings')
+def test_semantic_cache_skips_repeat_generation(mock_get_settings, mock_generator, mock_retriever, mock_vectorstore, mock_settings):
+    mock_settings.semantic_cache_enabled = True
+    mock_settings.semantic_cache_threshold = 0.95
+    mock_settings.semantic_cache_ttl = 3600
+    mock_get_settings.return_value = mock_settings
+    mock_vectorstore.version = 1
+    mock_retriever.store = mock_vectorstore
+    mock_retriever.embeddings.embed_query.return_value = [0.1, 0.2, 0.3]
+    doc = Document(page_content="This is a test document.", metadata={"source": "test.txt"})
+    mock_retriever.similarity_search_by_vector.return_value = [(doc, 0.9)]
+
+    pipeline = RAGPipeline()
+    first = pipeline.generate_response("What is COVID-19?", vectorstore=mock_vectorstore)
+    second = pipeline.generate_response("what is covid-19", vectorstore=mock_vectorstore)
+
+    assert second["answer"] == first["answer"]
+    assert second["metadata"]["cache_hit"] is True
+    mock_generator.generate.assert_called_once()
+
+    mock_vectorstore.version = 2
+    pipeline.generate_response("What is COVID-19?", vectorstore=mock_vectorstore)
+    assert mock_generator.generate.call_count == 2
+
+    # A different store at the same version, e.g. one reusing a collected store's id()
+    mock_vectorstore.cache_token = object()
+    pipeline.generate_response("What is COVID-19?", vectorstore=mock_vectorstore)
+    assert mock_generator.generate.call_count == 3
+
+    mock_generator.model_name = "another-model"
+    pipeline.generate_response("What is COVID-19?", vectorstore=mock_vectorstore)
+    assert mock_generator.generate.call_count == 4
+
+
+@patch('src.core.rag_pipeline.get_settings')
+def test_prepare_context_format(mock_get_settings, mock_generator, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    pipeline = RAGPipeline()
+    docs = [
+        (Document(page_content=" First chunk ", metadata={"source": "a.txt"}), 0.5),
+        (Document(page_content="Second chunk", metadata={}), 0.25),
+    ]
+
+    context = pipeline._prepare_context(docs)
+
+    rule = "\n" + "=" * 80
+    assert context == (
+        rule
+        + "\nDocument 1 (Source: a.txt, Score: 0.500):\nFirst chunk\n"
+        + "\nDocument 2 (Source: Unknown, Score: 0.250):\nSecond chunk"
+        + rule
+    )
+
+
+@patch('src.core.rag_pipeline.get_settings')
+def test_abatch_generate_responses_inside_running_loop(mock_get_settings, mock_generator, mock_retriever, mock_vectorstore, mock_settings):
+    mock_get_settings.return_value = mock_settings
+    mock_retriever.store = mock_vectorstore
+    mock_retriever.embeddings.embed_queries.return_value = [[1.0], [2.0]]
+    doc = Document(page_content="This is a test document.", metadata={"source": "test.txt"})
+    mock_retriever.similarity_search_batch_by_vector.return_value = [[(doc, 0.9)], [(doc, 0.8)]]
+    pipeline = RAGPipeline()
+
+    async def _caller():
+        return await pipeline.abatch_generate_responses(["q1", "q2"], mock_vectorstore, k=1)
+
+    results = asyncio.run(_caller())
+
+    assert [r["answer"] for r in results] == ["This is a generated answer."] * 2
+    assert mock_generator.agenerate.await_count == 2